@@ -3,15 +3,39 @@ Build SQLite databases.
 
 """
 from microcosm_sqlite.builders.csv import CSVBuilder
+from microcosm_sqlite.builders.jsonl import JSONLinesBuilder
+from microcosm_sqlite.builders.parquet import ParquetBuilder
+from microcosm_sqlite.builders.staging import StagedBuild
 
 
 class SQLiteBuilder:
     """
     Top-level binding for SQLite database building.
 
+    Listeners registered with `listen()` receive the progress events of every build
+    (see `BuildProgress`), e.g. to log or export build throughput.
+
     """
     def __init__(self, graph):
         self.graph = graph
+        self.listeners = []
+
+    def listen(self, listener):
+        self.listeners.append(listener)
+        return listener
 
     def csv(self, model_cls, **kwargs):
-        return CSVBuilder(self.graph, model_cls, **kwargs)
+        return CSVBuilder(self.graph, model_cls, **self.options(kwargs))
+
+    def jsonl(self, model_cls, **kwargs):
+        return JSONLinesBuilder(self.graph, model_cls, **self.options(kwargs))
+
+    def parquet(self, model_cls, **kwargs):
+        return ParquetBuilder(self.graph, model_cls, **self.options(kwargs))
+
+    def staged(self, data_set, **kwargs):
+        return StagedBuild(self.graph, data_set, **self.options(kwargs))
+
+    def options(self, kwargs):
+        kwargs.setdefault("listeners", self.listeners)
+        return kwargs
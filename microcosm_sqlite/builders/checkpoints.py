@@ -0,0 +1,118 @@
+"""
+Build checkpoints.
+
+"""
+from os import PathLike
+from os.path import abspath
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    String,
+    Table,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.sql.expression import delete
+
+from microcosm_sqlite.builders.writers import metadata
+
+
+# The number of durably loaded rows of each (table, source) of an unfinished build.
+checkpoints = Table(
+    "microcosm_sqlite_checkpoints",
+    metadata,
+    Column("table_name", String, primary_key=True),
+    Column("source", String, primary_key=True),
+    Column("rows", Integer, nullable=False),
+    Column("complete", Boolean, nullable=False),
+)
+
+
+def source_name(source):
+    """
+    Identify a build input across runs.
+
+    """
+    if isinstance(source, (str, PathLike)):
+        return abspath(source)
+
+    name = getattr(source, "name", None)
+    if not isinstance(name, str):
+        raise ValueError(f"Cannot checkpoint a build input without a name: {source}")
+    return abspath(name)
+
+
+class Checkpoints:
+    """
+    Track how many rows of each build input were loaded.
+
+    Progress is saved in the same transaction as the rows it describes, so that a
+    restarted build can resume from the last commit; it is cleared once the build
+    completes.
+
+    """
+    def __init__(self):
+        self.progress = dict()
+        self.current = None
+
+    def start(self, session, table_name, source):
+        """
+        Start loading a build input, returning its (rows, complete) checkpoint.
+
+        """
+        checkpoints.create(bind=session.connection(), checkfirst=True)
+
+        self.current = table_name, source_name(source)
+        checkpoint = session.execute(
+            select(checkpoints.c.rows, checkpoints.c.complete).where(
+                checkpoints.c.table_name == self.current[0],
+                checkpoints.c.source == self.current[1],
+            ),
+        ).first()
+
+        rows, complete = checkpoint or (0, False)
+        self.progress[self.current] = [rows, complete]
+        return rows, complete
+
+    def advance(self, count):
+        self.progress[self.current][0] += count
+
+    def complete(self):
+        self.progress[self.current][1] = True
+
+    def save(self, session):
+        if not self.progress:
+            return
+
+        statement = insert(checkpoints)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[checkpoints.c.table_name, checkpoints.c.source],
+                set_=dict(
+                    rows=statement.excluded.rows,
+                    complete=statement.excluded.complete,
+                ),
+            ),
+            [
+                dict(
+                    table_name=table_name,
+                    source=source,
+                    rows=rows,
+                    complete=complete,
+                )
+                for (table_name, source), (rows, complete) in self.progress.items()
+            ],
+        )
+
+    def clear(self, session):
+        if not self.progress:
+            return
+
+        session.execute(
+            delete(checkpoints).where(
+                tuple_(checkpoints.c.table_name, checkpoints.c.source).in_(list(self.progress)),
+            ),
+        )
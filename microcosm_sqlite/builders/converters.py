@@ -0,0 +1,105 @@
+"""
+Row conversion.
+
+"""
+from operator import itemgetter
+
+
+def get_columns(model_cls):
+    """
+    Map column names to their attribute key and column.
+
+    """
+    return {
+        column.name: (key, column)
+        for key, column in model_cls.__mapper__.columns.items()
+    }
+
+
+def as_tuple(columns, name, value):
+    """
+    Convert a named value to a (key, value) pair; blanks are null for nullable columns.
+
+    """
+    key, column = columns[name]
+    # NB as for `RowConverter.convert`, only blanks are null, not other falsy values
+    if column.nullable and (value is None or value == ""):
+        return key, None
+    return key, value
+
+
+class RowConverter:
+    """
+    Precompiled conversion of positional CSV rows for a single model class.
+
+    Column keys, nullability and defaults are resolved once per CSV header, so that
+    converting a row only has to pick its values by position.
+
+    """
+    def __init__(self, model_cls, header, defaults):
+        columns = get_columns(model_cls)
+
+        # NB later header fields win, as they do for DictReader
+        positions = {
+            name: index
+            for index, name in enumerate(header)
+            if name in columns
+        }
+
+        self.model_cls = model_cls
+        self.width = len(header)
+        self.names = tuple(positions)
+        self.keys = tuple(columns[name][0] for name in self.names)
+        self.nullable = tuple(columns[name][1].nullable for name in self.names)
+        self.pick = self.picker(tuple(positions.values()))
+
+        # CSV values win over defaults
+        self.constants = [
+            (name, *as_tuple(columns, name, value))
+            for name, value in defaults.items()
+            if name in columns and name not in positions
+        ]
+
+    def as_model(self, row):
+        """
+        Convert a row into a model instance.
+
+        """
+        kwargs = self.convert(row, self.keys)
+        kwargs.update(
+            (key, value)
+            for _, key, value in self.constants
+        )
+        return self.model_cls(**kwargs)
+
+    def as_values(self, row):
+        """
+        Convert a row into Core insert parameters (keyed by column name).
+
+        """
+        values = self.convert(row, self.names)
+        values.update(
+            (name, value)
+            for name, _, value in self.constants
+        )
+        return values
+
+    def convert(self, row, keys):
+        if len(row) < self.width:
+            # NB missing trailing fields are None, as they are for DictReader
+            row = list(row) + [None] * (self.width - len(row))
+
+        # NB only blanks are null, so that typed inputs (e.g. JSON) keep falsy values
+        return {
+            key: None if nullable and (value is None or value == "") else value
+            for key, nullable, value in zip(keys, self.nullable, self.pick(row))
+        }
+
+    @staticmethod
+    def picker(positions):
+        if not positions:
+            return lambda row: ()
+        if len(positions) == 1:
+            index, = positions
+            return lambda row: (row[index],)
+        return itemgetter(*positions)
@@ -2,9 +2,39 @@
 CSV-based building.
 
 """
-from csv import DictReader
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from csv import reader as csv_reader
+from itertools import islice
+from os import cpu_count
+from tempfile import TemporaryDirectory
+from time import monotonic
 
-from sqlalchemy.sql.expression import delete, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.schema import sort_tables
+from sqlalchemy.sql.expression import delete
+
+from microcosm_sqlite.builders.checkpoints import Checkpoints
+from microcosm_sqlite.builders.converters import RowConverter, as_tuple, get_columns
+from microcosm_sqlite.builders.fast_load import fast_load
+from microcosm_sqlite.builders.parallel import DEFAULT_RANGE_SIZE, iter_converted_rows
+from microcosm_sqlite.builders.progress import BuildProgress
+from microcosm_sqlite.builders.quarantine import quarantine_foreign_keys
+from microcosm_sqlite.builders.scratch import (
+    MAX_SCRATCH_DATABASES,
+    attach,
+    check_foreign_keys,
+    detach,
+    load_scratch,
+    merge_scratch,
+    partition,
+    scratch_path_for,
+)
+from microcosm_sqlite.builders.writers import ChunkWriter, HashDiffWriter, MergeWriter
+from microcosm_sqlite.compression import open_text
+
+
+DEFAULT_CHUNK_SIZE = 10000
 
 
 class CSVBuilder:
@@ -12,6 +42,55 @@ class CSVBuilder:
     CSV-based builder for a single model class (non bulk mode)
     and multi model class (bulk mode).
 
+    Rows are added through the ORM by default. In chunked mode, rows are instead
+    collected into fixed-size chunks and each chunk is written with a single Core
+    `executemany`, skipping ORM instance creation entirely; chunked mode writes to
+    each model's own table, so it does not support joined-table inheritance.
+
+    Commits happen after every insert (`commit_on_insert`), once at the end, or
+    whenever `commit_every` rows or `commit_interval` seconds have accumulated since
+    the previous commit. The session is expunged on every commit to keep memory flat.
+    Bulk builds defer foreign keys until commit, so with a commit policy (or
+    `commit_on_insert`), every intermediate commit checks them: parent inputs must then
+    come before their children's.
+
+    Fast load mode is meant for offline builds: it relaxes durability pragmas and defers
+    index maintenance for the duration of the build (see `fast_load`).
+
+    In parallel mode, build inputs are CSV file paths: a pool of `workers` processes
+    parses and converts byte ranges of each file while the build inserts the converted
+    rows in chunks (see `parallel`).
+
+    In merge mode, rows are upserted on the primary key (or on the columns of a unique
+    constraint) instead of inserted, optionally deleting rows missing from the input;
+    `build` then returns the `MergeCounts` of each model class (see `MergeWriter`).
+    Diff mode is a merge that skips rows whose content hash did not change since the
+    previous diff build (see `HashDiffWriter`).
+
+    Inputs may be file objects or paths; `compression` ("gzip", "zstd" or "infer") reads
+    them as compressed streams (see `open_text`).
+
+    Resumable builds checkpoint the number of loaded rows of each input (identified by
+    path or file name) on every commit, so that a failed build can be restarted from its
+    last commit; pair them with a commit policy such as `commit_every`.
+
+    In scratch mode (bulk builds of file paths only), tables are loaded in parallel into
+    separate scratch databases by up to `scratch_workers` processes, then merged into the
+    target in foreign key dependency order; foreign keys are checked once, at the end.
+    Scratch builds do not support merging, resuming, quarantine, parallel conversion
+    or commit policies.
+
+    In quarantine mode, rows that fail conversion or insertion are passed to a
+    `reject_sink` (along with the error) instead of failing the build; the sink keeps
+    a summary of rejected rows (see `RejectSink`). Failing chunks are retried row by
+    row within savepoints. Bulk builds defer foreign keys, so rows violating them are
+    rejected on the final commit instead (see `quarantine_foreign_keys`).
+
+    Build throughput is tracked in a `BuildProgress` and reported to `listeners`.
+
+    Builds write to the data set's configured database unless given another `engine`
+    (e.g. for a staged build, see `StagedBuild`).
+
     """
     def __init__(
         self,
@@ -20,96 +99,472 @@ class CSVBuilder:
         bulk_mode=False,
         commit_on_insert=False,
         delete_before_load=False,
+        chunk_size=None,
+        commit_every=None,
+        commit_interval=None,
+        fast_load_mode=False,
+        workers=None,
+        range_size=DEFAULT_RANGE_SIZE,
+        merge_mode=False,
+        merge_keys=None,
+        delete_missing=False,
+        diff_mode=False,
+        engine=None,
+        compression=None,
+        resumable=False,
+        scratch_workers=None,
+        reject_sink=None,
+        listeners=None,
     ):
         self.graph = graph
         self.model_cls = model_cls
         self.bulk_mode = bulk_mode
         self.commit_on_insert = commit_on_insert
         self.delete_before_load = delete_before_load
+        self.chunk_size = chunk_size
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        self.fast_load_mode = fast_load_mode
+        self.workers = workers
+        self.range_size = range_size
+        self.merge_mode = merge_mode or diff_mode
+        self.merge_keys = merge_keys
+        self.delete_missing = delete_missing
+        self.diff_mode = diff_mode
+        self.engine = engine
+        self.compression = compression
+        self.resumable = resumable
+        self.scratch_workers = scratch_workers
+        self.reject_sink = reject_sink
+        self.listeners = list(listeners or [])
         self.defaults = dict()
+        self.converters = dict()
+
+        self.uncommitted = 0
+        self.last_commit = None
+        self.results = dict()
+        self.models = []
+        self.checkpoints = None
+        self.skip = 0
+        self.progress = BuildProgress()
 
     def build(self, build_input):
+        if self.resumable and self.delete_missing:
+            raise ValueError("Resumable builds cannot delete missing rows")
+        if self.scratch_workers and (self.merge_mode or self.resumable or not self.bulk_mode):
+            raise ValueError("Scratch builds only support (non merge, non resumable) bulk builds")
+        if self.scratch_workers and (self.reject_sink is not None or self.workers):
+            raise ValueError("Scratch builds do not support quarantine or parallel conversion")
+        if self.scratch_workers and (self.commit_every or self.commit_interval):
+            raise ValueError("Scratch builds do not support commit policies")
+
+        self.uncommitted = 0
+        self.last_commit = monotonic()
+        self.results = dict()
+        self.checkpoints = Checkpoints() if self.resumable else None
+        self.progress = BuildProgress(self.listeners)
+
         if self.bulk_mode:
-            return self._build_in_bulk(build_input)
+            build_input = list(build_input)
+            self.models = [model_cls for model_cls, _ in build_input]
         else:
-            return self._build(build_input)
+            self.models = [self.model_cls]
+
+        with self._connect(self.models) as bind:
+            if self.scratch_workers:
+                self._build_from_scratch(build_input, bind)
+            elif self.bulk_mode:
+                self._build_in_bulk(build_input, bind)
+            else:
+                self._build(build_input, bind)
+
+        self.progress.finished()
+
+        if self.merge_mode:
+            return self.results
 
     def bulk(self):
         self.bulk_mode = True
         return self
 
+    def fast(self):
+        self.fast_load_mode = True
+        return self
+
+    def parallel(self, workers=None, range_size=DEFAULT_RANGE_SIZE):
+        self.workers = workers or cpu_count()
+        self.range_size = range_size
+        return self
+
+    def scratch(self, workers=None):
+        self.scratch_workers = min(workers or cpu_count(), MAX_SCRATCH_DATABASES)
+        return self
+
+    def report(self, *listeners):
+        self.listeners.extend(listeners)
+        return self
+
+    def quarantine(self, reject_sink):
+        self.reject_sink = reject_sink
+        return self
+
+    def resume(self):
+        self.resumable = True
+        return self
+
+    def merge(self, keys=None, delete_missing=False):
+        self.merge_mode = True
+        self.merge_keys = keys
+        self.delete_missing = delete_missing
+        return self
+
+    def diff(self, keys=None, delete_missing=False):
+        self.diff_mode = True
+        return self.merge(keys=keys, delete_missing=delete_missing)
+
+    def chunked(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        return self
+
+    def batched(self, commit_every=None, commit_interval=None):
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+        return self
+
     def default(self, **kwargs):
         self.defaults.update(kwargs)
+        # converters embed the defaults
+        self.converters.clear()
         return self
 
+    def converter_for(self, model_cls, header):
+        """
+        Return the (cached) row converter for a model class and CSV header.
+
+        """
+        key = model_cls, tuple(header)
+        converter = self.converters.get(key)
+        if converter is None:
+            converter = self.converters[key] = RowConverter(model_cls, header, self.defaults)
+        return converter
+
     def delete_all(self, model_class, session):
         # NB not using store, as for some models, e.g. the ones
         # resulting from a mixins, we don't have a store.
         return session.execute(
-            delete(text(model_class.__tablename__)),
+            delete(model_class.__table__),
         )
 
-    def _build(self, fileobj):
-        csv = DictReader(fileobj)
+    def _connect(self, models):
+        """
+        Return a context manager for the connection to bind build sessions to, if any.
 
-        with self.model_cls.new_context(self.graph) as context:
-            if self.delete_before_load:
-                self.delete_all(self.model_cls, context.session)
+        """
+        engine = self.engine
+        if engine is None:
+            engine, _ = self.graph.sqlite(self.model_cls.resolve().__name__)
 
-            for row in csv:
-                model = self.as_model(self.model_cls, row)
-                context.session.add(model)
-                if self.commit_on_insert:
-                    # Commit rows individually
-                    context.commit()
+        if self.fast_load_mode:
+            return fast_load(
+                engine,
+                {model_cls.__table__ for model_cls in models},
+            )
+
+        if any((
+            self.engine is not None,
+            # NB scratch databases are attached to a connection
+            self.scratch_workers,
+            # NB merged keys are tracked in a temporary table, which only exists
+            # for the connection that created it
+            self.merge_mode and self.delete_missing,
+        )):
+            return engine.connect()
+
+        return nullcontext()
 
-            if not self.commit_on_insert:
-                context.commit()
+    def _build(self, fileobj, bind=None):
+        with self.model_cls.new_context(self.graph, bind=bind) as context:
+            self._load(context, self.model_cls, fileobj)
+            self._commit(context, final=True)
 
-    def _build_in_bulk(self, model_fileobj):
+    def _build_in_bulk(self, model_fileobj, bind=None):
         with self.model_cls.new_context(
             graph=self.graph,
             defer_foreign_keys=True,
+            bind=bind,
         ) as context:
             for model_cls, fileobj in model_fileobj:
-                if self.delete_before_load:
-                    self.delete_all(model_cls, context.session)
+                self._load(context, model_cls, fileobj)
 
-                reader = DictReader(fileobj)
+            self._commit(context, final=True)
 
-                for row in reader:
-                    context.session.add(
-                        self.as_model(model_cls, row),
+    def _build_from_scratch(self, model_paths, connection):
+        tables = {model_cls.__table__ for model_cls, _ in model_paths}
+        groups = partition(model_paths, self.scratch_workers)
+        options = dict(
+            chunk_size=self.chunk_size or DEFAULT_CHUNK_SIZE,
+            compression=self.compression,
+        )
+
+        with TemporaryDirectory() as scratch_dir:
+            with ProcessPoolExecutor(max_workers=len(groups)) as executor:
+                loaded = list(executor.map(
+                    load_scratch,
+                    [scratch_path_for(scratch_dir, index) for index in range(len(groups))],
+                    [type(self)] * len(groups),
+                    [options] * len(groups),
+                    [self.defaults] * len(groups),
+                    groups,
+                ))
+
+            # NB databases cannot be attached within a transaction
+            dbapi_connection = connection.connection.dbapi_connection
+            schemas = attach(dbapi_connection, [scratch_path for scratch_path, _ in loaded])
+            try:
+                with self.model_cls.new_context(
+                    graph=self.graph,
+                    defer_foreign_keys=True,
+                    bind=connection,
+                ) as context:
+                    if self.delete_before_load:
+                        for table in reversed(sort_tables(tables)):
+                            context.session.execute(delete(table))
+
+                    merge_scratch(
+                        context.session,
+                        tables,
+                        {
+                            schema: table_names
+                            for schema, (_, table_names) in zip(schemas, loaded)
+                        },
                     )
-                    if self.commit_on_insert:
-                        # Commit rows individually
-                        context.session.commit()
+                    check_foreign_keys(context.session)
+                    self._commit(context, final=True)
+            finally:
+                connection.rollback()
+                detach(dbapi_connection, schemas)
+
+    def _load(self, context, model_cls, fileobj):
+        self.skip = 0
+        if self.checkpoints is not None:
+            self.skip, complete = self.checkpoints.start(
+                context.session,
+                model_cls.__table__.name,
+                fileobj,
+            )
+            if complete:
+                return
+
+        if self.delete_before_load and not self.skip:
+            self.delete_all(model_cls, context.session)
+
+        with self.progress.loading(model_cls):
+            if self.workers:
+                result = self._load_in_parallel(context, model_cls, fileobj)
+            else:
+                result = self._load_serially(context, model_cls, fileobj)
+
+        if result is not None:
+            self.results[model_cls] = result
+
+        if self.checkpoints is not None:
+            self.checkpoints.complete()
+
+    def _load_serially(self, context, model_cls, source):
+        if self.chunk_size or self.merge_mode or self.reject_sink is not None:
+            rows = self.convert(model_cls, self.read(source), "as_values", context.session)
+            return self._insert_chunks(context, model_cls, self._resume(rows))
+
+        models = self._resume(self.convert(model_cls, self.read(source), "as_model"))
+        while True:
+            with self.progress.timing("read"):
+                model = next(models, None)
+            if model is None:
+                break
+
+            with self.progress.timing("write"):
+                context.session.add(model)
+            self.progress.rows_parsed += 1
+            self.progress.rows_inserted += 1
+            self._inserted(context, 1)
+
+    def _load_in_parallel(self, context, model_cls, path):
+        if self.compression:
+            raise ValueError("Compressed inputs cannot be split for parallel parsing")
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            rows = iter_converted_rows(
+                executor,
+                path,
+                model_cls,
+                self.defaults,
+                max_pending=2 * self.workers,
+                range_size=self.range_size,
+            )
+            return self._insert_chunks(context, model_cls, self._resume(rows))
+
+    def _resume(self, rows):
+        """
+        Skip the rows that were loaded before the last checkpoint.
+
+        """
+        if not self.skip:
+            return rows
+        return islice(rows, self.skip, None)
+
+    def read(self, source):
+        """
+        Read a build input as (header, positional rows) groups.
+
+        """
+        with open_text(source, self.compression) as fileobj:
+            reader = csv_reader(self.progress.counting(fileobj))
+            header = next(reader, None)
+            if header is None:
+                return
+
+            # NB skip blank lines, as DictReader does
+            yield header, (row for row in reader if row)
+
+    def convert(self, model_cls, groups, method, session=None):
+        """
+        Convert (header, rows) groups with the converter `method` for their header.
+
+        """
+        for header, rows in groups:
+            convert = getattr(self.converter_for(model_cls, header), method)
+            if self.reject_sink is None:
+                yield from map(convert, rows)
+                continue
+
+            for row in rows:
+                try:
+                    yield convert(row)
+                except Exception as error:
+                    self.reject_sink.reject(session, model_cls, dict(zip(header, row)), error)
+                    self.progress.rows_parsed += 1
+                    self.progress.rows_rejected += 1
+
+    def _insert_chunks(self, context, model_cls, rows):
+        writer = self.writer_for(model_cls)
+        chunk_size = self.chunk_size or DEFAULT_CHUNK_SIZE
+
+        writer.start(context.session)
+        while True:
+            with self.progress.timing("read"):
+                chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            with self.progress.timing("write"):
+                if self.reject_sink is None:
+                    writer.write(context.session, chunk)
+                    rejected = 0
+                else:
+                    rejected = self._write_or_quarantine(context.session, writer, model_cls, chunk)
+
+            self.progress.chunk(len(chunk), rejected)
+            self._inserted(context, len(chunk))
+
+        return writer.finish(context.session)
+
+    def _write_or_quarantine(self, session, writer, model_cls, chunk):
+        """
+        Write a chunk, retrying it row by row to reject failing rows.
+
+        :returns: the number of rejected rows
+
+        """
+        if len(chunk) > 1:
+            try:
+                with session.begin_nested():
+                    writer.write(session, chunk)
+                return 0
+            except SQLAlchemyError:
+                pass
+
+        rejected = 0
+        for row in chunk:
+            try:
+                with session.begin_nested():
+                    writer.write(session, [row])
+            except SQLAlchemyError as error:
+                self.reject_sink.reject(session, model_cls, row, error)
+                rejected += 1
+
+        return rejected
+
+    def writer_for(self, model_cls):
+        if self.diff_mode:
+            return HashDiffWriter(
+                model_cls,
+                keys=self.merge_keys,
+                delete_missing=self.delete_missing,
+            )
+
+        if self.merge_mode:
+            return MergeWriter(
+                model_cls,
+                keys=self.merge_keys,
+                delete_missing=self.delete_missing,
+            )
+
+        return ChunkWriter(model_cls)
+
+    def _inserted(self, context, count):
+        """
+        Apply the commit policy after `count` rows were inserted.
+
+        """
+        self.uncommitted += count
+        if self.checkpoints is not None:
+            self.checkpoints.advance(count)
+
+        if self.commit_on_insert:
+            # Commit rows (or chunks) individually
+            return self._commit(context)
+
+        if self.commit_every and self.uncommitted >= self.commit_every:
+            return self._commit(context)
+
+        if self.commit_interval and monotonic() - self.last_commit >= self.commit_interval:
+            return self._commit(context)
+
+    def _commit(self, context, final=False):
+        if self.checkpoints is not None:
+            if final:
+                self.checkpoints.clear(context.session)
+            else:
+                self.checkpoints.save(context.session)
+
+        if final and self.bulk_mode and self.reject_sink is not None:
+            # NB parents may come after their children until the last input
+            rejected = quarantine_foreign_keys(context.session, self.reject_sink, self.models)
+            self.progress.rows_inserted -= rejected
+            self.progress.rows_rejected += rejected
+
+        started = monotonic()
+        context.commit()
+        context.session.expunge_all()
 
-            if not self.commit_on_insert:
-                context.session.commit()
+        self.uncommitted = 0
+        self.last_commit = monotonic()
+        self.progress.committed(self.last_commit - started)
 
     def as_model(self, model_cls, row):
-        columns = self.get_columns(model_cls)
+        return self.converter_for(model_cls, row.keys()).as_model(list(row.values()))
 
-        row_dict = self.defaults.copy()
-        row_dict.update(row)
+    def as_values(self, model_cls, row):
+        """
+        Convert a row into Core insert parameters (keyed by column name).
 
-        return model_cls(**dict(
-            self.as_tuple(columns, name, value)
-            for name, value in row_dict.items()
-            if name in columns
-        ))
+        """
+        return self.converter_for(model_cls, row.keys()).as_values(list(row.values()))
 
     @staticmethod
     def get_columns(model_cls):
-        return {
-            column.name: (key, column)
-            for key, column in model_cls.__mapper__.columns.items()
-        }
+        return get_columns(model_cls)
 
     @staticmethod
     def as_tuple(columns, name, value):
-        key, column = columns[name]
-        if not value and column.nullable:
-            return key, None
-        return key, value
+        return as_tuple(columns, name, value)
@@ -0,0 +1,33 @@
+"""
+JSON Lines-based building.
+
+"""
+from itertools import groupby
+from json import loads
+
+from microcosm_sqlite.builders.csv import CSVBuilder
+from microcosm_sqlite.compression import open_text
+
+
+class JSONLinesBuilder(CSVBuilder):
+    """
+    JSON Lines-based builder: one JSON object per line, keyed by column name.
+
+    Supports the same modes, defaults and nullable handling as the CSV builder,
+    except for parallel parsing.
+
+    """
+    def read(self, source):
+        with open_text(source, self.compression) as fileobj:
+            records = (
+                loads(line)
+                for line in self.progress.counting(fileobj)
+                if line.strip()
+            )
+
+            # NB consecutive records with the same keys share a converter
+            for header, group in groupby(records, key=tuple):
+                yield header, (list(record.values()) for record in group)
+
+    def _load_in_parallel(self, context, model_cls, path):
+        raise ValueError("JSON Lines inputs do not support parallel parsing")
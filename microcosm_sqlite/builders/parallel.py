@@ -0,0 +1,143 @@
+"""
+Parallel CSV parsing.
+
+CSV files are split into line-aligned byte ranges that worker processes parse and
+convert independently; converted rows are streamed back (in file order) to a single
+writer, since SQLite only supports one writer at a time.
+
+Ranges only end on line breaks outside of quoted fields, found by tracking the parity of
+quote characters (escaped quotes come in pairs), so that quoted fields may contain line
+breaks; splitting therefore reads through the whole file (without parsing it), yielding
+each range as soon as it is found, so that workers start parsing early.
+
+"""
+from collections import deque
+from csv import reader as csv_reader
+from io import StringIO
+from os import fstat
+
+from microcosm_sqlite.builders.converters import RowConverter
+
+
+# NB 16 MiB of CSV per task
+DEFAULT_RANGE_SIZE = 16 * 1024 * 1024
+
+# The size of the blocks read to count quote characters.
+BLOCK_SIZE = 1024 * 1024
+
+QUOTE = b'"'
+
+
+def count_quotes(fileobj, size):
+    """
+    Read `size` bytes (or up to the end of file), counting their quote characters.
+
+    """
+    quotes = 0
+    while size > 0:
+        block = fileobj.read(min(size, BLOCK_SIZE))
+        if not block:
+            break
+        quotes += block.count(QUOTE)
+        size -= len(block)
+    return quotes
+
+
+def finish_record(fileobj, quotes=0):
+    """
+    Read up to the end of the current record, given the number of its quotes read so far.
+
+    A line break only ends a record outside of quoted fields, i.e. after an even number
+    of quote characters.
+
+    :returns: the bytes read
+
+    """
+    lines = []
+    while True:
+        line = fileobj.readline()
+        lines.append(line)
+        quotes += line.count(QUOTE)
+        if not line or quotes % 2 == 0:
+            return b"".join(lines)
+
+
+def read_header(path, encoding="utf-8"):
+    """
+    Read the header of a CSV file.
+
+    :returns: the header and the byte offset of the first record
+
+    """
+    with open(path, "rb") as fileobj:
+        header = next(csv_reader(StringIO(finish_record(fileobj).decode(encoding), newline="")), [])
+        return header, fileobj.tell()
+
+
+def split_ranges(path, start, range_size=DEFAULT_RANGE_SIZE):
+    """
+    Split a CSV file, from a byte offset, into record-aligned (start, end) byte ranges.
+
+    Ranges are yielded as they are found.
+
+    """
+    with open(path, "rb") as fileobj:
+        fileobj.seek(start)
+        size = fstat(fileobj.fileno()).st_size
+
+        while start < size:
+            quotes = count_quotes(fileobj, range_size)
+            finish_record(fileobj, quotes)
+            end = fileobj.tell()
+            yield start, end
+            start = end
+
+
+def convert_range(path, model_cls, header, defaults, start, end, encoding="utf-8"):
+    """
+    Parse and convert a byte range of a CSV file into Core insert parameters.
+
+    Runs in a worker process.
+
+    """
+    converter = RowConverter(model_cls, header, defaults)
+
+    with open(path, "rb") as fileobj:
+        fileobj.seek(start)
+        data = fileobj.read(end - start)
+
+    return [
+        converter.as_values(row)
+        for row in csv_reader(StringIO(data.decode(encoding), newline=""))
+        # NB skip blank lines, as DictReader does
+        if row
+    ]
+
+
+def iter_converted_rows(
+    executor,
+    path,
+    model_cls,
+    defaults,
+    max_pending,
+    range_size=DEFAULT_RANGE_SIZE,
+    encoding="utf-8",
+):
+    """
+    Yield the converted rows of a CSV file (in order), parsing ranges in `executor`.
+
+    At most `max_pending` ranges are in flight, to bound memory.
+
+    """
+    header, start = read_header(path, encoding)
+
+    pending = deque()
+    for start, end in split_ranges(path, start, range_size):
+        pending.append(
+            executor.submit(convert_range, path, model_cls, header, defaults, start, end, encoding),
+        )
+        if len(pending) >= max_pending:
+            yield from pending.popleft().result()
+
+    while pending:
+        yield from pending.popleft().result()
@@ -0,0 +1,123 @@
+"""
+Parquet-based building.
+
+Requires the `pyarrow` package (e.g. via the `parquet` extra).
+
+"""
+from microcosm_sqlite.builders.converters import get_columns
+from microcosm_sqlite.builders.csv import DEFAULT_CHUNK_SIZE, CSVBuilder
+from microcosm_sqlite.caching import mark_written
+
+
+class ParquetBuilder(CSVBuilder):
+    """
+    Parquet-based builder, reading a file's record batches.
+
+    Outside of merge (and diff) and quarantine modes, each record batch is inserted
+    column-wise: values are converted a column at a time and passed to a single positional
+    `executemany`, without building per-row dicts.
+
+    Read bytes are counted as the decoded (Arrow) size of each record batch.
+
+    """
+    def read(self, source):
+        for batch in self.batches(source):
+            yield batch.schema.names, zip(*(
+                column.to_pylist()
+                for column in batch.columns
+            ))
+
+    def batches(self, source):
+        try:
+            from pyarrow.parquet import ParquetFile
+        except ImportError as error:
+            raise ImportError("Parquet inputs require the `pyarrow` package") from error
+
+        batches = ParquetFile(source).iter_batches(
+            batch_size=self.chunk_size or DEFAULT_CHUNK_SIZE,
+        )
+        for batch in batches:
+            self.progress.bytes_read += batch.nbytes
+            yield batch
+
+    def _load_serially(self, context, model_cls, source):
+        if self.merge_mode or self.reject_sink is not None:
+            return super()._load_serially(context, model_cls, source)
+
+        skip = self.skip
+        batches = self.batches(source)
+        while True:
+            with self.progress.timing("read"):
+                batch = next(batches, None)
+            if batch is None:
+                break
+
+            if skip >= batch.num_rows:
+                # loaded before the last checkpoint
+                skip -= batch.num_rows
+                continue
+
+            batch, skip = batch.slice(skip), 0
+            with self.progress.timing("write"):
+                self._insert_batch(context, model_cls, batch)
+
+            self.progress.chunk(batch.num_rows)
+            self._inserted(context, batch.num_rows)
+
+    def _load_in_parallel(self, context, model_cls, path):
+        raise ValueError("Parquet inputs do not support parallel parsing")
+
+    def _insert_batch(self, context, model_cls, batch):
+        columns = get_columns(model_cls)
+        size = batch.num_rows
+
+        values = dict()
+        for name, column in zip(batch.schema.names, batch.columns):
+            if name not in columns:
+                continue
+
+            values[name] = column.to_pylist()
+            if columns[name][1].nullable:
+                values[name] = [
+                    None if value == "" else value
+                    for value in values[name]
+                ]
+
+        # CSV (here: Parquet) values win over defaults
+        converter = self.converter_for(model_cls, list(values))
+        for name, _, value in converter.constants:
+            values[name] = [value] * size
+
+        if not values:
+            # NB rather than (one) DEFAULT VALUES insert per batch
+            raise ValueError(f"Cannot build {model_cls.__table__.name} without any of its columns")
+
+        table = model_cls.__table__
+        session = context.session
+        dialect = session.get_bind().dialect
+        compiled = table.insert().compile(dialect=dialect, column_keys=list(values))
+
+        # NB column defaults apply to the columns missing from the input
+        for name in compiled.positiontup:
+            if name in values:
+                continue
+
+            default = table.c[name].default
+            if not default.is_scalar:
+                # e.g. callable defaults need Core's per-row execution
+                return session.execute(
+                    table.insert(),
+                    [dict(zip(values, row)) for row in zip(*values.values())],
+                )
+            values[name] = [default.arg] * size
+
+        parameters = []
+        for name in compiled.positiontup:
+            process = table.c[name].type.dialect_impl(dialect).bind_processor(dialect)
+            parameters.append(
+                values[name] if process is None else map(process, values[name])
+            )
+
+        session.connection().exec_driver_sql(str(compiled), list(zip(*parameters)))
+        # NB driver SQL bypasses the session's execute events
+        mark_written(session)
@@ -0,0 +1,109 @@
+"""
+Build progress.
+
+"""
+from contextlib import contextmanager
+from time import monotonic
+
+
+class BuildProgress:
+    """
+    Throughput metrics of a build, reported to listeners as the build progresses.
+
+    Listeners are callables taking an event name and the progress itself; events are:
+
+     -  "model_started" and "model_finished", around loading each build input
+     -  "chunk", after writing each chunk of rows
+     -  "commit", after each commit
+     -  "build_finished"
+
+    Time is accounted to reading (parsing and converting inputs, or waiting on parallel
+    workers to do so), writing and committing, to locate the bottleneck of a build.
+
+    """
+    def __init__(self, listeners=()):
+        self.listeners = list(listeners)
+        self.started = monotonic()
+
+        self.model = None
+        self.rows_parsed = 0
+        self.rows_inserted = 0
+        self.rows_rejected = 0
+        self.bytes_read = 0
+        self.commits = 0
+        self.last_commit_seconds = None
+
+        self.read_seconds = 0.0
+        self.write_seconds = 0.0
+        self.commit_seconds = 0.0
+        self.model_seconds = dict()
+
+    @property
+    def elapsed_seconds(self):
+        return monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        elapsed_seconds = self.elapsed_seconds
+        if not elapsed_seconds:
+            return 0.0
+        return self.rows_inserted / elapsed_seconds
+
+    def emit(self, event):
+        for listener in self.listeners:
+            listener(event, self)
+
+    @contextmanager
+    def loading(self, model_cls):
+        started = monotonic()
+        self.model = model_cls
+        self.emit("model_started")
+
+        yield
+
+        name = model_cls.__table__.name
+        self.model_seconds[name] = self.model_seconds.get(name, 0.0) + monotonic() - started
+        self.emit("model_finished")
+
+    @contextmanager
+    def timing(self, name):
+        """
+        Add the time spent in the context to the `<name>_seconds` metric.
+
+        """
+        started = monotonic()
+        try:
+            yield
+        finally:
+            attribute = f"{name}_seconds"
+            setattr(self, attribute, getattr(self, attribute) + monotonic() - started)
+
+    def chunk(self, parsed, rejected=0):
+        self.rows_parsed += parsed
+        self.rows_inserted += parsed - rejected
+        self.rows_rejected += rejected
+        self.emit("chunk")
+
+    def committed(self, seconds):
+        self.commits += 1
+        self.commit_seconds += seconds
+        self.last_commit_seconds = seconds
+        self.emit("commit")
+
+    def finished(self):
+        self.emit("build_finished")
+
+    def counting(self, lines, encoding="utf-8"):
+        """
+        Count the bytes of (text) lines as they are read.
+
+        Counting has a per-line cost, so it only happens when there are listeners.
+
+        """
+        if not self.listeners:
+            yield from lines
+            return
+
+        for line in lines:
+            self.bytes_read += len(line.encode(encoding))
+            yield line
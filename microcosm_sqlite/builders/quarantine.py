@@ -0,0 +1,153 @@
+"""
+Row-level error quarantine.
+
+"""
+from abc import ABCMeta, abstractmethod
+from collections import Counter
+from csv import writer as csv_writer
+from json import dumps
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Table,
+    Text,
+    delete,
+    insert,
+    literal_column,
+    select,
+    text,
+)
+
+from microcosm_sqlite.builders.writers import metadata
+from microcosm_sqlite.errors import ModelIntegrityError
+
+
+# Rows rejected by builds, with the error that rejected them.
+rejects = Table(
+    "microcosm_sqlite_rejects",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("table_name", String, nullable=False),
+    Column("row", Text, nullable=False),
+    Column("error", Text, nullable=False),
+)
+
+
+def describe(error):
+    """
+    Describe an error, preferring the underlying DBAPI error, if any.
+
+    """
+    return str(getattr(error, "orig", None) or error)
+
+
+class RejectSink(metaclass=ABCMeta):
+    """
+    A destination for rejected rows.
+
+    Keeps a count of rejected rows per table, as a summary of the build.
+
+    """
+    def __init__(self):
+        self.rejected = Counter()
+
+    def reject(self, session, model_cls, row, error):
+        self.rejected[model_cls.__table__.name] += 1
+        self.write(session, model_cls, row, error)
+
+    @abstractmethod
+    def write(self, session, model_cls, row, error):
+        """
+        Write a rejected row.
+
+        """
+        pass
+
+    def summary(self):
+        return dict(self.rejected)
+
+
+class CSVRejectSink(RejectSink):
+    """
+    Write rejected rows to a CSV file object as (table, error, JSON row) records.
+
+    """
+    def __init__(self, fileobj):
+        super().__init__()
+        self.writer = csv_writer(fileobj)
+
+    def write(self, session, model_cls, row, error):
+        self.writer.writerow([
+            model_cls.__table__.name,
+            describe(error),
+            dumps(row, default=str),
+        ])
+
+
+class TableRejectSink(RejectSink):
+    """
+    Write rejected rows to the `microcosm_sqlite_rejects` table of the built database.
+
+    Rejects are written within the build's transaction.
+
+    """
+    def __init__(self):
+        super().__init__()
+        self.created = False
+
+    def write(self, session, model_cls, row, error):
+        if not self.created:
+            rejects.create(bind=session.connection(), checkfirst=True)
+            self.created = True
+
+        session.execute(
+            insert(rejects).values(
+                table_name=model_cls.__table__.name,
+                row=dumps(row, default=str),
+                error=describe(error),
+            ),
+        )
+
+
+def quarantine_foreign_keys(session, reject_sink, models):
+    """
+    Reject (and delete) the rows of some models' tables that violate foreign keys.
+
+    Deferred foreign keys are only checked on commit, which would otherwise fail the whole
+    build; rejecting a parent row may orphan its children, so checks repeat until clean.
+
+    :returns: the number of rejected rows
+
+    """
+    tables = {model_cls.__table__.name: model_cls for model_cls in models}
+
+    rejected = 0
+    while True:
+        # NB a row may violate several foreign keys
+        violations = {
+            (table_name, rowid): parent
+            for table_name, rowid, parent, _ in session.execute(text("PRAGMA main.foreign_key_check"))
+            # NB rows of other tables (or WITHOUT ROWID tables) cannot be rejected
+            if table_name in tables and rowid is not None
+        }
+        if not violations:
+            return rejected
+
+        for (table_name, rowid), parent in violations.items():
+            model_cls = tables[table_name]
+            table = model_cls.__table__
+            row = session.execute(
+                select(table).where(literal_column("rowid") == rowid),
+            ).mappings().one()
+            session.execute(
+                delete(table).where(literal_column("rowid") == rowid),
+            )
+            reject_sink.reject(
+                session,
+                model_cls,
+                dict(row),
+                ModelIntegrityError(f"FOREIGN KEY constraint failed: {table_name} references {parent}"),
+            )
+            rejected += 1
@@ -0,0 +1,157 @@
+"""
+Scratch building.
+
+Tables are loaded in parallel into separate scratch databases (one per worker process)
+and then merged into the target database with `ATTACH` and `INSERT ... SELECT`, in
+foreign key dependency order.
+
+"""
+from itertools import islice
+from os.path import getsize, join
+
+from sqlalchemy import (
+    Column,
+    MetaData,
+    Table,
+    create_engine,
+    event,
+    insert,
+    select,
+    text,
+)
+from sqlalchemy.schema import CreateTable, sort_tables
+
+from microcosm_sqlite.builders.writers import ChunkWriter
+from microcosm_sqlite.errors import ModelIntegrityError
+
+
+# NB SQLite's default SQLITE_MAX_ATTACHED
+MAX_SCRATCH_DATABASES = 10
+
+
+def partition(model_sources, parts):
+    """
+    Group (model class, path) pairs by table into at most `parts` balanced groups.
+
+    Every table is loaded by a single group, largest inputs first.
+
+    """
+    by_table = dict()
+    for model_cls, source in model_sources:
+        by_table.setdefault(model_cls.__table__, []).append((model_cls, source))
+
+    sized = sorted(
+        (
+            (sum(getsize(source) for _, source in loads), loads)
+            for loads in by_table.values()
+        ),
+        key=lambda item: item[0],
+        reverse=True,
+    )
+
+    groups = [[0, []] for _ in range(min(parts, len(by_table)))]
+    for size, loads in sized:
+        group = min(groups, key=lambda group: group[0])
+        group[0] += size
+        group[1].extend(loads)
+
+    return [loads for _, loads in groups]
+
+
+def on_scratch_connect(dbapi_connection, _):
+    # scratch databases are disposable
+    dbapi_connection.execute("PRAGMA journal_mode=OFF")
+    dbapi_connection.execute("PRAGMA synchronous=OFF")
+
+
+def load_scratch(scratch_path, builder_cls, options, defaults, loads):
+    """
+    Load (model class, path) pairs into a new scratch database.
+
+    Runs in a worker process; tables are created without indexes or enforced
+    foreign keys.
+
+    """
+    builder = builder_cls(None, None, **options).default(**defaults)
+
+    engine = create_engine(f"sqlite:///{scratch_path}")
+    event.listen(engine, "connect", on_scratch_connect)
+
+    try:
+        with engine.begin() as connection:
+            created = set()
+            for model_cls, source in loads:
+                table = model_cls.__table__
+                if table not in created:
+                    connection.execute(CreateTable(table))
+                    created.add(table)
+
+                writer = ChunkWriter(model_cls)
+                rows = builder.convert(model_cls, builder.read(source), "as_values")
+                while chunk := list(islice(rows, builder.chunk_size)):
+                    writer.write(connection, chunk)
+    finally:
+        engine.dispose()
+
+    return scratch_path, sorted({model_cls.__table__.name for model_cls, _ in loads})
+
+
+def scratch_path_for(scratch_dir, index):
+    return join(scratch_dir, f"scratch_{index}.db")
+
+
+def attach(dbapi_connection, scratch_paths):
+    """
+    Attach scratch databases (outside of any transaction), returning their schema names.
+
+    """
+    schemas = []
+    for index, scratch_path in enumerate(scratch_paths):
+        schema = f"scratch_{index}"
+        dbapi_connection.execute(f"ATTACH DATABASE ? AS {schema}", (scratch_path,))
+        schemas.append(schema)
+    return schemas
+
+
+def detach(dbapi_connection, schemas):
+    for schema in schemas:
+        dbapi_connection.execute(f"DETACH DATABASE {schema}")
+
+
+def merge_scratch(session, tables, schema_tables):
+    """
+    Copy scratch tables into the target database in foreign key dependency order.
+
+    :param schema_tables: a mapping from attached schema name to the loaded table names
+
+    """
+    for table in sort_tables(tables):
+        for schema, table_names in schema_tables.items():
+            if table.name not in table_names:
+                continue
+
+            scratch_table = Table(
+                table.name,
+                MetaData(),
+                *(Column(column.name, column.type) for column in table.columns),
+                schema=schema,
+            )
+            session.execute(
+                insert(table).from_select(
+                    [column.name for column in table.columns],
+                    select(*scratch_table.columns),
+                ),
+            )
+
+
+def check_foreign_keys(session):
+    """
+    Raise if any foreign key of the target database is violated.
+
+    """
+    violations = session.execute(text("PRAGMA main.foreign_key_check")).all()
+    if violations:
+        raise ModelIntegrityError(
+            "Foreign key violations (table, rowid, parent, fkid): "
+            f"{[tuple(violation) for violation in violations[:10]]}",
+        )
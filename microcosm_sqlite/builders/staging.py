@@ -0,0 +1,117 @@
+"""
+Staged building.
+
+"""
+from os import close, remove, replace
+from os.path import abspath, basename, dirname
+from tempfile import mkstemp
+
+from sqlalchemy import text
+
+from microcosm_sqlite.builders.csv import CSVBuilder
+from microcosm_sqlite.builders.jsonl import JSONLinesBuilder
+from microcosm_sqlite.builders.parquet import ParquetBuilder
+from microcosm_sqlite.files import publish_mode
+
+
+class StagedBuild:
+    """
+    Build a data set into a temporary file and atomically publish it.
+
+    The staging file lives next to the data set's configured path, so that publishing
+    is a single `rename()` over that path; readers keep using the previous file (and never
+    wait on the build's write lock) until the data set's engine is disposed on publish.
+
+    Publishing over a database in WAL mode is not supported, since the previous file's
+    `-wal` and `-shm` files would be left behind.
+
+        with graph.sqlite_builder.staged(Base) as staged:
+            staged.csv(SomeModel).build(fileobj)
+
+    """
+    def __init__(self, graph, data_set, create_all=True, listeners=None):
+        self.graph = graph
+        self.data_set = data_set.resolve()
+        self.name = self.data_set.__name__
+        self.create_all = create_all
+        self.listeners = list(listeners or [])
+
+        self.path = graph.sqlite.path_for(self.name)
+        if self.path == ":memory:":
+            raise ValueError(f"Cannot stage a build of in-memory data set: {self.name}")
+
+        self.staging_path = None
+        self.engine = None
+
+    def csv(self, model_cls, **kwargs):
+        return self.builder(CSVBuilder, model_cls, **kwargs)
+
+    def jsonl(self, model_cls, **kwargs):
+        return self.builder(JSONLinesBuilder, model_cls, **kwargs)
+
+    def parquet(self, model_cls, **kwargs):
+        return self.builder(ParquetBuilder, model_cls, **kwargs)
+
+    def builder(self, builder_cls, model_cls, **kwargs):
+        if self.engine is None:
+            # NB builders without an engine would write to the live data set
+            raise ValueError(f"Cannot build before opening the staged build of: {self.name}")
+
+        kwargs.setdefault("listeners", self.listeners)
+        return builder_cls(self.graph, model_cls, engine=self.engine, **kwargs)
+
+    def open(self):
+        fd, self.staging_path = mkstemp(
+            dir=dirname(abspath(self.path)),
+            prefix=f".{basename(self.path)}.",
+            suffix=".staging",
+        )
+        close(fd)
+
+        self.engine = self.graph.sqlite.create_engine(self.staging_path)
+        if self.create_all:
+            self.data_set.metadata.create_all(bind=self.engine)
+
+        return self
+
+    def publish(self):
+        """
+        Optimize the staged database and rename it over the data set's path.
+
+        """
+        with self.engine.connect() as connection:
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+
+        # NB VACUUM cannot run within a transaction
+        dbapi_connection = self.engine.raw_connection()
+        try:
+            dbapi_connection.execute("VACUUM")
+        finally:
+            dbapi_connection.close()
+
+        self.engine.dispose()
+        publish_mode(self.staging_path, self.path)
+        replace(self.staging_path, self.path)
+        self.staging_path = None
+
+        # new connections (and sessions) will use the published file
+        self.data_set.dispose(self.graph)
+
+    def discard(self):
+        self.engine.dispose()
+        if self.staging_path is not None:
+            remove(self.staging_path)
+            self.staging_path = None
+
+    # context manager
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, *args, **kwargs):
+        try:
+            if exc_type is None:
+                self.publish()
+        finally:
+            self.discard()
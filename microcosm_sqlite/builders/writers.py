@@ -0,0 +1,433 @@
+"""
+Chunk writers.
+
+A chunk writer writes chunks of converted rows (Core insert parameters, keyed by column
+name) for a single model class:
+
+ -  `start` is called before the first chunk
+ -  `write` is called for every chunk
+ -  `finish` is called after the last chunk and returns the writer's result, if any
+
+"""
+from hashlib import blake2b
+from itertools import groupby
+from json import dumps
+
+from sqlalchemy import (
+    Column,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    Numeric,
+    String,
+    Table,
+    and_,
+    exists,
+    func,
+    or_,
+    select,
+    tuple_,
+)
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.sql.expression import delete
+
+from microcosm_sqlite.constants import SQLITE_MAX_VARIABLE_NUMBER
+
+
+metadata = MetaData()
+
+# Content hashes of the rows written by diff builds, keyed by table and row key.
+row_hashes = Table(
+    "microcosm_sqlite_row_hashes",
+    metadata,
+    Column("table_name", String, primary_key=True),
+    Column("row_key", String, primary_key=True),
+    Column("row_hash", String, nullable=False),
+)
+
+
+def stored_as(column):
+    """
+    Return a function normalizing input values as SQLite stores them in a column.
+
+    SQLite converts numeric text (e.g. " 01") to numbers in numeric columns, so that
+    different inputs of the same value compare (and hash) alike once normalized.
+
+    """
+    if isinstance(column.type, Integer):
+        python_type = int
+    elif isinstance(column.type, (Float, Numeric)):
+        python_type = float
+    else:
+        return lambda value: value
+
+    def normalize(value):
+        if not isinstance(value, str):
+            return value
+        try:
+            return python_type(value)
+        except ValueError:
+            return value
+
+    return normalize
+
+
+class ChunkWriter:
+    """
+    Insert chunks with a single Core `executemany` each.
+
+    """
+    def __init__(self, model_cls):
+        self.model_cls = model_cls
+        self.table = model_cls.__table__
+        self.statement = self.table.insert()
+
+    def start(self, session):
+        pass
+
+    def write(self, session, chunk):
+        for rows in self.uniform(chunk):
+            session.execute(self.statement, rows)
+
+    @staticmethod
+    def uniform(rows):
+        """
+        Split rows into runs with the same keys, as required by `executemany`.
+
+        """
+        for _, run in groupby(rows, key=dict.keys):
+            yield list(run)
+
+    def finish(self, session):
+        return None
+
+
+class MergeCounts:
+    """
+    The outcome of merging input rows into a table.
+
+    """
+    def __init__(self, inserted=0, updated=0, deleted=0, unchanged=0):
+        self.inserted = inserted
+        self.updated = updated
+        self.deleted = deleted
+        self.unchanged = unchanged
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}("
+            f"inserted={self.inserted}, "
+            f"updated={self.updated}, "
+            f"deleted={self.deleted}, "
+            f"unchanged={self.unchanged})"
+        )
+
+
+class MergeWriter(ChunkWriter):
+    """
+    Upsert chunks with `INSERT ... ON CONFLICT DO UPDATE`, keyed on the primary key or
+    on the columns of a declared unique constraint.
+
+    Only columns present in the input are updated and rows whose values did not change
+    are left untouched. Optionally, rows whose key is missing from the input are deleted;
+    seen keys are tracked in a temporary table, so the session must keep using the same
+    connection for the whole merge.
+
+    Rows count as inserted when their key did not exist before they were written, so that
+    a key repeated in the input counts as inserted once, then as updated (or unchanged).
+
+    """
+    def __init__(self, model_cls, keys=None, delete_missing=False):
+        super().__init__(model_cls)
+        self.keys = keys or [column.name for column in self.table.primary_key]
+        self.delete_missing = delete_missing
+        self.statements = dict()
+        self.normalizers = dict()
+        self.seen = None
+
+        self.processed = 0
+        self.inserted = 0
+        self.changed = 0
+
+    def start(self, session):
+        if self.delete_missing:
+            self.seen = self.seen_keys_table()
+            self.seen.create(bind=session.connection())
+
+    def write(self, session, chunk):
+        self.validate(chunk)
+        self.track(session, chunk)
+        self.upsert(session, chunk)
+        self.processed += len(chunk)
+
+    def validate(self, rows):
+        """
+        Check that rows have the key columns before reading their keys.
+
+        """
+        for run in self.uniform(rows):
+            # NB statements are only cached (once per set of input columns) once validated
+            self.statement_for(tuple(run[0]))
+
+    def upsert(self, session, rows):
+        existing = self.existing_keys(session, rows)
+        inserted = 0
+        for row in rows:
+            key = self.key_of(row)
+            if key not in existing:
+                existing.add(key)
+                inserted += 1
+
+        changed = 0
+        for run in self.uniform(rows):
+            statement = self.statement_for(tuple(run[0]))
+            changed += session.execute(statement, run).rowcount
+
+        # NB only count changes once the whole write succeeded
+        self.inserted += inserted
+        self.changed += changed
+
+    def existing_keys(self, session, rows):
+        """
+        Return the (normalized) keys of rows that already exist in the table.
+
+        """
+        keys = list(dict.fromkeys(self.key_of(row) for row in rows))
+        if len(self.keys) == 1:
+            column, = (self.table.c[key] for key in self.keys)
+            values = [key for key, in keys]
+        else:
+            column = tuple_(*(self.table.c[key] for key in self.keys))
+            values = keys
+
+        existing = set()
+        batch_size = SQLITE_MAX_VARIABLE_NUMBER // len(self.keys)
+        for index in range(0, len(values), batch_size):
+            existing.update(
+                tuple(key)
+                for key in session.execute(
+                    select(*(self.table.c[key] for key in self.keys)).where(
+                        column.in_(values[index:index + batch_size]),
+                    ),
+                )
+            )
+        return existing
+
+    def key_of(self, row):
+        return tuple(self.normalized(key, row[key]) for key in self.keys)
+
+    def normalized(self, name, value):
+        normalize = self.normalizers.get(name)
+        if normalize is None:
+            normalize = self.normalizers[name] = stored_as(self.table.c[name])
+        return normalize(value)
+
+    def track(self, session, rows):
+        """
+        Record the keys of input rows, if deleting missing rows.
+
+        """
+        if self.seen is None:
+            return
+
+        session.execute(
+            self.seen.insert(),
+            [
+                self.seen_values(row)
+                for row in rows
+            ],
+        )
+
+    def seen_values(self, row):
+        return {key: row[key] for key in self.keys}
+
+    def finish(self, session):
+        inserted = self.inserted
+        updated = self.changed - inserted
+
+        deleted = 0
+        if self.seen is not None:
+            deleted = session.execute(
+                delete(self.table).where(
+                    ~exists().where(and_(*(
+                        self.seen.c[key] == self.table.c[key]
+                        for key in self.keys
+                    ))),
+                ),
+            ).rowcount
+            self.seen.drop(bind=session.connection())
+            self.seen = None
+
+        return MergeCounts(
+            inserted=inserted,
+            updated=updated,
+            deleted=deleted,
+            unchanged=self.processed - inserted - updated,
+        )
+
+    def count(self, session):
+        return session.execute(
+            select(func.count()).select_from(self.table),
+        ).scalar()
+
+    def statement_for(self, names):
+        """
+        Return the (cached) upsert statement for a set of input columns.
+
+        """
+        statement = self.statements.get(names)
+        if statement is not None:
+            return statement
+
+        missing = set(self.keys) - set(names)
+        if missing:
+            raise ValueError(f"Cannot merge {self.table.name} without key columns: {sorted(missing)}")
+
+        statement = insert(self.table)
+        updates = [
+            name
+            for name in names
+            if name not in self.keys
+        ]
+
+        if updates:
+            statement = statement.on_conflict_do_update(
+                index_elements=self.keys,
+                set_={
+                    name: statement.excluded[name]
+                    for name in updates
+                },
+                where=or_(*(
+                    self.table.c[name].is_distinct_from(statement.excluded[name])
+                    for name in updates
+                )),
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(
+                index_elements=self.keys,
+            )
+
+        self.statements[names] = statement
+        return statement
+
+    def seen_keys_table(self, *columns):
+        name = f"merged_keys_{self.table.name}"
+        return Table(
+            name,
+            MetaData(),
+            *(
+                Column(key, self.table.c[key].type)
+                for key in self.keys
+            ),
+            *columns,
+            Index(f"ix_{name}", *self.keys),
+            prefixes=["TEMPORARY"],
+        )
+
+
+class HashDiffWriter(MergeWriter):
+    """
+    Merge only the rows whose content changed since the previous (diff) build.
+
+    A content hash of every written row is stored in a side table; incoming rows whose
+    hash matches the stored one are skipped (and counted as unchanged). Hashes describe
+    the input of previous builds, so changes made to the table by other means go unnoticed,
+    except that hashes are discarded whenever the table is found empty.
+
+    Row keys and hashes are computed from values as stored (see `stored_as`), so that
+    inputs that only differ in their representation (e.g. "01" and "1") match.
+
+    """
+    def start(self, session):
+        super().start(session)
+
+        row_hashes.create(bind=session.connection(), checkfirst=True)
+        if not self.count(session):
+            # e.g. after `delete_before_load`; stale hashes would skip every row
+            self.forget(session)
+
+    def write(self, session, chunk):
+        self.validate(chunk)
+        self.track(session, chunk)
+
+        hashes = [
+            dict(
+                table_name=self.table.name,
+                row_key=self.row_key(row),
+                row_hash=self.row_hash(row),
+            )
+            for row in chunk
+        ]
+        stored = self.stored_hashes(session, [values["row_key"] for values in hashes])
+
+        changed = [
+            (row, values)
+            for row, values in zip(chunk, hashes)
+            if stored.get(values["row_key"]) != values["row_hash"]
+        ]
+        if changed:
+            self.upsert(session, [row for row, _ in changed])
+
+            statement = insert(row_hashes)
+            session.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[row_hashes.c.table_name, row_hashes.c.row_key],
+                    set_=dict(row_hash=statement.excluded.row_hash),
+                ),
+                [values for _, values in changed],
+            )
+
+        self.processed += len(chunk)
+
+    def finish(self, session):
+        if self.seen is not None:
+            # NB forget the hashes of rows that are about to be deleted
+            session.execute(
+                delete(row_hashes).where(
+                    row_hashes.c.table_name == self.table.name,
+                    row_hashes.c.row_key.not_in(select(self.seen.c.row_key)),
+                ),
+            )
+
+        return super().finish(session)
+
+    def seen_keys_table(self):
+        return super().seen_keys_table(Column("row_key", String))
+
+    def seen_values(self, row):
+        values = super().seen_values(row)
+        values.update(row_key=self.row_key(row))
+        return values
+
+    def forget(self, session):
+        session.execute(
+            delete(row_hashes).where(
+                row_hashes.c.table_name == self.table.name,
+            ),
+        )
+
+    def stored_hashes(self, session, row_keys):
+        stored = dict()
+        for index in range(0, len(row_keys), SQLITE_MAX_VARIABLE_NUMBER - 1):
+            stored.update(
+                session.execute(
+                    select(row_hashes.c.row_key, row_hashes.c.row_hash).where(
+                        row_hashes.c.table_name == self.table.name,
+                        row_hashes.c.row_key.in_(
+                            row_keys[index:index + SQLITE_MAX_VARIABLE_NUMBER - 1],
+                        ),
+                    ),
+                ).all(),
+            )
+        return stored
+
+    def row_key(self, row):
+        return dumps(list(self.key_of(row)), default=str, separators=(",", ":"))
+
+    def row_hash(self, row):
+        values = sorted(
+            (name, self.normalized(name, value))
+            for name, value in row.items()
+        )
+        return blake2b(repr(values).encode(), digest_size=16).hexdigest()
@@ -0,0 +1,203 @@
+"""
+Store result caching.
+
+"""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+
+# The number of writes through each engine's sessions (and of commits seen from others).
+generations: "WeakKeyDictionary[Engine, int]" = WeakKeyDictionary()
+generations_lock = Lock()
+
+# The session info key marking writes not yet committed (or rolled back).
+WRITES_PENDING = "microcosm_sqlite.writes_pending"
+
+# The connection info key of the last `PRAGMA data_version` seen through a connection.
+DATA_VERSION = "microcosm_sqlite.data_version"
+
+
+def engine_of(session):
+    bind = session.get_bind()
+    return getattr(bind, "engine", bind)
+
+
+def invalidate(session, *args):
+    """
+    Invalidate results cached through any session of the same engine (i.e. data set).
+
+    """
+    bind = session.bind
+    if bind is None:
+        # NB not a (single bind) data set session
+        return
+
+    bump(getattr(bind, "engine", bind))
+
+
+def bump(engine):
+    with generations_lock:
+        generations[engine] = generations.get(engine, 0) + 1
+
+
+def generation_of(engine):
+    with generations_lock:
+        return generations.get(engine, 0)
+
+
+def mark_written(session, *args):
+    """
+    Invalidate cached results and mark the session as holding uncommitted writes.
+
+    """
+    session.info[WRITES_PENDING] = True
+    invalidate(session)
+
+
+def mark_written_bulk(context):
+    mark_written(context.session)
+
+
+def mark_executed(orm_execute_state):
+    """
+    Mark statements executed through a session as writes, unless they are selects.
+
+    Writes through the session's own connection do not change its `data_version`.
+
+    """
+    if not orm_execute_state.is_select:
+        mark_written(orm_execute_state.session)
+
+
+def transaction_ended(session, transaction):
+    """
+    Invalidate cached results once a transaction that wrote commits (or rolls back).
+
+    Transactions that only read leave cached results valid.
+
+    """
+    if transaction.parent is None and session.info.pop(WRITES_PENDING, None):
+        invalidate(session)
+
+
+def has_writes(session):
+    """
+    Whether a session holds writes that other sessions cannot (yet) see.
+
+    """
+    return bool(
+        session.info.get(WRITES_PENDING)
+        or session.new
+        or session.deleted
+        or session.dirty
+    )
+
+
+def listen_for_writes(session_factory):
+    """
+    Invalidate cached results on writes through the sessions of a data set's sessionmaker.
+
+    """
+    event.listen(session_factory, "after_flush", mark_written)
+    event.listen(session_factory, "do_orm_execute", mark_executed)
+    event.listen(session_factory, "after_transaction_end", transaction_ended)
+    event.listen(session_factory, "after_bulk_delete", mark_written_bulk)
+    event.listen(session_factory, "after_bulk_update", mark_written_bulk)
+
+
+class ResultCache:
+    """
+    A read-through LRU (and optionally TTL) cache of store results.
+
+    Results are invalidated by writes through any session of the data set (i.e. created
+    by the `SQLiteBindFactory`'s sessionmaker for the data set's engine) and,
+    when `check_data_version` is set, by commits of other connections (including other
+    processes), as seen by the `PRAGMA data_version` of the session's connection.
+
+    Results are cached per engine, and neither read from nor written to the cache while
+    the session holds uncommitted writes (see `has_writes`), so that sessions never see
+    each other's uncommitted writes.
+
+    Stores merge cached instances into the current session (see `Store._cached`), so that
+    callers never share instances across sessions (or threads).
+
+    """
+    def __init__(self, max_size=1024, ttl=None, check_data_version=True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_data_version = check_data_version
+
+        self.entries = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, session, key, load):
+        """
+        Return the cached value of a (hashable) key, or load and cache it.
+
+        """
+        if has_writes(session):
+            return load()
+
+        key = engine_of(session), key
+        version = self.version_of(session)
+        now = monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry_version, expires_at, value = entry
+                if entry_version == version and (expires_at is None or expires_at > now):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+
+        value = load()
+
+        with self.lock:
+            self.entries[key] = (
+                version,
+                None if self.ttl is None else now + self.ttl,
+                value,
+            )
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+        return value
+
+    def version_of(self, session):
+        engine = engine_of(session)
+        if self.check_data_version:
+            self.check_commits(engine, session.connection())
+
+        return generation_of(engine)
+
+    def check_commits(self, engine, connection):
+        """
+        Invalidate cached results if a connection saw commits of other connections.
+
+        Data versions are specific to each connection (so cannot be compared across
+        connections): each connection compares its own with the last it saw, and a
+        connection's first check invalidates, as earlier commits cannot be ruled out.
+
+        """
+        data_version = connection.execute(text("PRAGMA data_version")).scalar()
+        if connection.info.get(DATA_VERSION) != data_version:
+            connection.info[DATA_VERSION] = data_version
+            bump(engine)
+
+    def forget(self, session, key):
+        with self.lock:
+            self.entries.pop((engine_of(session), key), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
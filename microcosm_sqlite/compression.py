@@ -0,0 +1,96 @@
+"""
+Compressed text streams.
+
+Supports gzip (standard library) and zstd (requires the `zstandard` package, e.g. via
+the `zstd` extra).
+
+"""
+from contextlib import contextmanager, nullcontext
+from gzip import GzipFile
+from io import TextIOWrapper
+from os import PathLike, fspath
+
+
+COMPRESSIONS = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+
+def infer_compression(source):
+    """
+    Infer the compression of a path from its extension, if any.
+
+    """
+    if not isinstance(source, (str, PathLike)):
+        return None
+
+    path = fspath(source)
+    for extension, compression in COMPRESSIONS.items():
+        if path.endswith(extension):
+            return compression
+    return None
+
+
+@contextmanager
+def open_text(source, compression=None, mode="r", encoding="utf-8"):
+    """
+    Open a (possibly compressed) text stream for a path or file object.
+
+    :param source: a path or a file object; file objects must be binary when compressed
+                   and are not closed on exit
+    :param compression: None, "gzip", "zstd" or "infer" (from the path's extension)
+    :param mode: "r" or "w"
+
+    """
+    if compression == "infer":
+        compression = infer_compression(source)
+
+    is_path = isinstance(source, (str, PathLike))
+
+    if compression is None:
+        if not is_path:
+            yield source
+            return
+
+        with open(source, mode, encoding=encoding, newline="") as fileobj:
+            yield fileobj
+        return
+
+    with open(source, f"{mode}b") if is_path else nullcontext(source) as raw:
+        with compressed_stream(raw, compression, mode) as stream:
+            text = TextIOWrapper(stream, encoding=encoding, newline="")
+            try:
+                yield text
+            finally:
+                if mode == "w":
+                    text.flush()
+                # NB leave closing the compressed stream to its own context
+                text.detach()
+
+
+@contextmanager
+def compressed_stream(raw, compression, mode):
+    if compression == "gzip":
+        with GzipFile(fileobj=raw, mode=f"{mode}b") as stream:
+            yield stream
+        return
+
+    if compression == "zstd":
+        try:
+            from zstandard import ZstdCompressor, ZstdDecompressor
+        except ImportError as error:
+            raise ImportError("zstd compression requires the `zstandard` package") from error
+
+        if mode == "w":
+            stream = ZstdCompressor().stream_writer(raw, closefd=False)
+        else:
+            stream = ZstdDecompressor().stream_reader(raw, closefd=False)
+
+        with stream:
+            yield stream
+        return
+
+    raise ValueError(f"Unsupported compression: {compression}")
@@ -7,3 +7,7 @@ naming_convention = dict(
     fk="fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
     pk="pk_%(table_name)s",
 )
+
+# The default maximum number of host parameters in a single SQLite statement
+# (before SQLite 3.32.0); batched statements stay below it.
+SQLITE_MAX_VARIABLE_NUMBER = 999
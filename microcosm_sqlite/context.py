@@ -16,20 +16,29 @@ class SessionContext:
         data_set,
         expire_on_commit=False,
         defer_foreign_keys=False,
+        bind=None,
     ):
         self.graph = graph
         self.data_set = data_set
         self.expire_on_commit = expire_on_commit
         self.defer_foreign_keys = defer_foreign_keys
+        self.bind = bind
 
     @property
     def session(self):
         return self.data_set.session
 
     def open(self):
+        kwargs = dict(
+            expire_on_commit=self.expire_on_commit,
+        )
+        if self.bind is not None:
+            # e.g. a connection with specific pragmas
+            kwargs.update(bind=self.bind)
+
         self.data_set.session = self.data_set.new_session(
             self.graph,
-            expire_on_commit=self.expire_on_commit,
+            **kwargs,
         )
         return self
 
@@ -44,6 +53,12 @@ class SessionContext:
         if session:
             session.commit()
 
+            if self.defer_foreign_keys:
+                # SQLite switches `defer_foreign_keys` off on every COMMIT
+                session.execute(
+                    text("PRAGMA defer_foreign_keys=ON"),
+                )
+
     def rollback(self):
         session = self.session
         if session:
@@ -63,8 +78,10 @@ class SessionContext:
 
         return context
 
-    def __exit__(self, *args, **kwargs):
-        if self.defer_foreign_keys:
+    def __exit__(self, exc_type, *args, **kwargs):
+        # NB a failed transaction may not accept statements; closing rolls it back,
+        # which switches `defer_foreign_keys` off anyway
+        if self.defer_foreign_keys and exc_type is None:
             session = self.session
             if session:
                 session.execute(
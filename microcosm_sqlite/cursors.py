@@ -0,0 +1,58 @@
+"""
+Keyset pagination cursors.
+
+Cursors are opaque (URL-safe) tokens encoding the sort key values of the last row of a page.
+
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from datetime import date, datetime
+from enum import Enum
+from json import dumps, loads
+
+from microcosm_sqlite.errors import InvalidCursorError
+
+
+def to_json(value):
+    if isinstance(value, Enum):
+        # NB as persisted (and bound) by `EnumType`
+        return value.name
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode a cursor value: {value!r}")
+
+
+def from_json(column, value):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    if value is not None and issubclass(python_type, date):
+        # NB datetime is a date
+        return python_type.fromisoformat(value)
+    return value
+
+
+def encode_cursor(values):
+    return urlsafe_b64encode(
+        dumps(list(values), default=to_json, separators=(",", ":")).encode(),
+    ).decode()
+
+
+def decode_cursor(cursor, columns):
+    try:
+        values = loads(urlsafe_b64decode(cursor.encode()))
+    except (AttributeError, BinasciiError, UnicodeDecodeError, ValueError) as error:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from error
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}")
+
+    try:
+        return [
+            from_json(column, value)
+            for column, value in zip(columns, values)
+        ]
+    except (TypeError, ValueError) as error:
+        raise InvalidCursorError(f"Invalid cursor: {cursor!r}") from error
@@ -9,6 +9,7 @@ from sqlalchemy.orm import declarative_base
 
 from microcosm_sqlite.constants import naming_convention
 from microcosm_sqlite.context import SessionContext
+from microcosm_sqlite.snapshots import snapshot
 
 
 class DataSet:
@@ -108,6 +109,16 @@ class DataSet:
             **kwargs
         )
 
+    @classmethod
+    def snapshot(cls, graph, destination, **kwargs):
+        """
+        Copy the live database into a file (see `snapshot`).
+
+        """
+        name = cls.resolve().__name__
+        engine, _ = graph.sqlite(name)
+        return snapshot(engine, destination, **kwargs)
+
     @classmethod
     def dispose(cls, graph):
         """
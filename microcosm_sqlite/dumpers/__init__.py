@@ -3,6 +3,9 @@ Dump SQLite databases to file.
 
 """
 from microcosm_sqlite.dumpers.csv import CSVDumper
+from microcosm_sqlite.dumpers.jsonl import JSONLinesDumper
+from microcosm_sqlite.dumpers.parallel import ParallelDumper
+from microcosm_sqlite.dumpers.parquet import ArrowDumper, ParquetDumper
 
 
 class SQLiteDumper:
@@ -15,3 +18,15 @@ class SQLiteDumper:
 
     def csv(self, store, **kwargs):
         return CSVDumper(self.graph, store, **kwargs)
+
+    def jsonl(self, store, **kwargs):
+        return JSONLinesDumper(self.graph, store, **kwargs)
+
+    def parquet(self, store, **kwargs):
+        return ParquetDumper(self.graph, store, **kwargs)
+
+    def arrow(self, store, **kwargs):
+        return ArrowDumper(self.graph, store, **kwargs)
+
+    def data_set(self, data_set, **kwargs):
+        return ParallelDumper(self.graph, data_set, **kwargs)
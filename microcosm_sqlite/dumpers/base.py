@@ -0,0 +1,80 @@
+"""
+Table dumping.
+
+"""
+from sqlalchemy import select
+
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class TableDumper:
+    """
+    Base dumper for the mapped columns of a single model class.
+
+    Whole-table dumps select the mapped columns with Core, streaming result rows in
+    batches of `batch_size`; `compression` is interpreted by each output format.
+
+    With `local_table()`, dumps select only the columns of the model's own table, e.g. one
+    table of a joined-table inheritance hierarchy.
+
+    """
+    def __init__(
+        self,
+        graph,
+        store,
+        model_cls=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        compression=None,
+    ):
+        self.graph = graph
+        self.store = store
+        self.model_cls = model_cls or store.model_class
+        self.batch_size = batch_size
+        self.compression = compression
+        self.local = False
+
+    def batched(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        return self
+
+    def local_table(self):
+        self.local = True
+        return self
+
+    def select_rows(self, connection, field_names, criteria=()):
+        """
+        Select the named mapped (or local table) columns, returning an iterator of row batches.
+
+        """
+        if self.local:
+            selectable = self.model_cls.__table__
+            columns = selectable.columns
+        else:
+            # NB e.g. the join of a joined-table inheritance subclass' tables
+            selectable = self.model_cls.__mapper__.selectable
+            columns = self.model_cls.__mapper__.columns
+        unmapped = [name for name in field_names if name not in columns]
+        if unmapped:
+            raise ValueError(f"Cannot dump unmapped fields: {', '.join(unmapped)}")
+
+        statement = select(
+            *(columns[name] for name in field_names)
+        ).select_from(
+            selectable
+        ).where(
+            *criteria
+        ).execution_options(
+            stream_results=True,
+            yield_per=self.batch_size,
+        )
+
+        return connection.execute(statement).partitions()
+
+    def get_columns(self):
+        if self.local:
+            return list(self.model_cls.__table__.columns.keys())
+
+        # NB in mapper order, so that dumps are reproducible; joined-table inheritance
+        # maps several (e.g. primary key) columns to one attribute
+        return [prop.key for prop in self.model_cls.__mapper__.column_attrs]
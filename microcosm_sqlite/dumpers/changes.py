@@ -0,0 +1,145 @@
+"""
+Change tracking.
+
+Changes to tracked tables are recorded by SQLite triggers into a change log, whose
+AUTOINCREMENT sequence is a monotonic watermark: an incremental dump emits the latest
+change of every row changed after a watermark, and returns the next one.
+
+"""
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    and_,
+    func,
+    select,
+    text,
+)
+from sqlalchemy.sql.expression import delete
+
+
+metadata = MetaData()
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+# The (JSON array) primary key of each changed row of the tracked tables.
+changes = Table(
+    "microcosm_sqlite_changes",
+    metadata,
+    Column("seq", Integer, primary_key=True),
+    Column("table_name", String, nullable=False),
+    Column("row_key", String, nullable=False),
+    Column("operation", String, nullable=False),
+    sqlite_autoincrement=True,
+)
+
+
+def primary_key_names(model_cls):
+    return [column.name for column in model_cls.__table__.primary_key.columns]
+
+
+def trigger_statements(model_cls):
+    table_name = model_cls.__table__.name
+    names = primary_key_names(model_cls)
+
+    def row_key(alias):
+        return "json_array({})".format(", ".join(f'{alias}."{name}"' for name in names))
+
+    def log(alias, operation, condition="1"):
+        return (
+            f"INSERT INTO {changes.name} (table_name, row_key, operation) "
+            f"SELECT '{table_name}', {row_key(alias)}, '{operation}' WHERE {condition};"
+        )
+
+    key_changed = f"{row_key('OLD')} IS NOT {row_key('NEW')}"
+
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS "{table_name}_changes_{INSERT}" '
+        f'AFTER INSERT ON "{table_name}" BEGIN {log("NEW", INSERT)} END',
+        # NB changing a primary key deletes the row at its previous key
+        f'CREATE TRIGGER IF NOT EXISTS "{table_name}_changes_{UPDATE}" '
+        f'AFTER UPDATE ON "{table_name}" BEGIN '
+        f'{log("OLD", DELETE, key_changed)} '
+        f'{log("NEW", UPDATE)} END',
+        f'CREATE TRIGGER IF NOT EXISTS "{table_name}_changes_{DELETE}" '
+        f'AFTER DELETE ON "{table_name}" BEGIN {log("OLD", DELETE)} END',
+    ]
+
+
+def track_changes(session, model_cls):
+    """
+    Record changes to a model's table from now on.
+
+    """
+    changes.create(bind=session.connection(), checkfirst=True)
+    for statement in trigger_statements(model_cls):
+        session.execute(text(statement))
+
+
+def untrack_changes(session, model_cls):
+    table_name = model_cls.__table__.name
+    for operation in (INSERT, UPDATE, DELETE):
+        session.execute(text(f'DROP TRIGGER IF EXISTS "{table_name}_changes_{operation}"'))
+
+
+def prune_changes(session, model_cls, watermark):
+    """
+    Forget changes up to (and including) a watermark, e.g. once consumed downstream.
+
+    """
+    session.execute(
+        delete(changes).where(
+            changes.c.table_name == model_cls.__table__.name,
+            changes.c.seq <= watermark,
+        ),
+    )
+
+
+def changed_rows(model_cls, field_names, watermark):
+    """
+    Select the latest change (seq, operation and current columns) of each changed row.
+
+    Deleted rows do not join their table, so their columns are null but for the primary
+    key, which is taken from the change log (as a tombstone).
+
+    """
+    table = model_cls.__table__
+    columns = model_cls.__mapper__.columns
+
+    latest = select(
+        changes.c.row_key,
+        func.max(changes.c.seq).label("seq"),
+    ).where(
+        changes.c.table_name == table.name,
+        changes.c.seq > watermark,
+    ).group_by(
+        changes.c.row_key,
+    ).subquery()
+
+    keys = {
+        name: func.json_extract(latest.c.row_key, f"$[{index}]")
+        for index, name in enumerate(primary_key_names(model_cls))
+    }
+
+    return select(
+        latest.c.seq,
+        changes.c.operation,
+        *(
+            keys[columns[name].name].label(name) if columns[name].name in keys else columns[name]
+            for name in field_names
+        ),
+    ).select_from(
+        latest.join(
+            changes,
+            changes.c.seq == latest.c.seq,
+        ).outerjoin(
+            table,
+            and_(*(table.c[name] == key for name, key in keys.items())),
+        ),
+    ).order_by(
+        latest.c.seq,
+    )
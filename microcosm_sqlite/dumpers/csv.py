@@ -2,51 +2,161 @@
 CSV-based building.
 
 """
-from csv import DictWriter
+from csv import DictWriter, writer as csv_writer
 
+from sqlalchemy import select
 
-class CSVDumper:
+from microcosm_sqlite.compression import open_text
+from microcosm_sqlite.dumpers.base import DEFAULT_BATCH_SIZE, TableDumper
+from microcosm_sqlite.dumpers.changes import changed_rows, prune_changes, track_changes
+
+
+class CSVDumper(TableDumper):
     """
     CSV-based builder for a single model class (non bulk mode)
     and multi model class (bulk mode).
 
+    Unless given `items`, dumps stream the whole table in batches of `batch_size`
+    instances, which are expunged once written so that memory use stays constant.
+
+    In tuple mode, whole-table dumps skip the ORM: a Core `select()` of the mapped
+    columns streams result rows (still converted by column types, e.g. `EnumType`)
+    straight to `csv.writer`, a batch at a time.
+
+    Output may be compressed as it is written (see `open_text`); compressed output must
+    be written to a path or a binary file object.
+
+    Once changes to the model's table are tracked (see `track_changes()`), incremental
+    dumps write only the rows changed after a watermark, with an `_operation` column;
+    deleted rows are written as tombstones (only their primary key is set).
+
     """
     def __init__(
         self,
         graph,
         store,
         model_cls=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        tuple_mode=False,
+        compression=None,
     ):
-        self.graph = graph
-        self.store = store
-        self.model_cls = model_cls or store.model_class
+        super().__init__(
+            graph,
+            store,
+            model_cls=model_cls,
+            batch_size=batch_size,
+            compression=compression,
+        )
+        self.tuple_mode = tuple_mode
         self.defaults = dict()
 
     def default(self, **kwargs):
         self.defaults.update(kwargs)
         return self
 
+    def tuples(self):
+        self.tuple_mode = True
+        return self
+
     def dump(self, fileobj, items=None, field_names=None, extras_action=None, custom_header=None):
-        if items is None:
-            items = self.store.session.query(self.model_cls).all()
+        with open_text(fileobj, self.compression, mode="w") as fileobj:
+            if items is None and self.tuple_mode:
+                field_names = list(field_names or self.get_columns())
+                return self.dump_tuples(fileobj, field_names, custom_header)
 
-        writer = DictWriter(
-            fileobj,
-            fieldnames=field_names or self.get_columns(),
-            extrasaction=extras_action or 'raise',  # raise is the default
-        )
+            writer = DictWriter(
+                fileobj,
+                fieldnames=field_names or self.get_columns(),
+                extrasaction=extras_action or 'raise',  # raise is the default
+            )
+
+            if custom_header:
+                writer.writerow(custom_header)
+            else:
+                writer.writeheader()
+
+            with self.model_cls.new_context(self.graph) as context:
+                if items is None:
+                    items = self.stream(context.session)
+
+                for item in items:
+                    writer.writerow(item._members())
+
+    def dump_tuples(self, fileobj, field_names, custom_header=None):
+        with self.model_cls.new_context(self.graph) as context:
+            self.write_tuples(context.session, fileobj, field_names, custom_header)
+
+    def write_tuples(self, connection, fileobj, field_names, custom_header=None, criteria=()):
+        """
+        Write the mapped columns of the (optionally filtered) table as CSV.
+
+        :param connection: a session or connection to select with
+
+        """
+        batches = self.select_rows(connection, field_names, criteria)
+
+        writer = csv_writer(fileobj)
 
         if custom_header:
-            writer.writerow(custom_header)
+            writer.writerow(custom_header.get(name, "") for name in field_names)
         else:
-            writer.writeheader()
+            writer.writerow(field_names)
+
+        for rows in batches:
+            writer.writerows(rows)
+
+    def track_changes(self):
+        with self.model_cls.new_context(self.graph) as context:
+            track_changes(context.session, self.model_cls)
+            context.commit()
+        return self
+
+    def dump_changes(self, fileobj, since=0, field_names=None):
+        """
+        Dump the rows changed after a watermark.
+
+        :returns: the watermark of the last dumped change (to dump the next changes from)
+
+        """
+        field_names = list(field_names or self.get_columns())
+        watermark = since
 
-        with self.model_cls.new_context(self.graph):
-            for item in items:
-                writer.writerow(item._members())
+        with open_text(fileobj, self.compression, mode="w") as fileobj:
+            writer = csv_writer(fileobj)
+            writer.writerow([*field_names, "_operation"])
+
+            statement = changed_rows(self.model_cls, field_names, since).execution_options(
+                stream_results=True,
+                yield_per=self.batch_size,
+            )
+            with self.model_cls.new_context(self.graph) as context:
+                for rows in context.session.execute(statement).partitions():
+                    writer.writerows(
+                        [*values, operation]
+                        for _, operation, *values in rows
+                    )
+                    watermark = rows[-1].seq
+
+        return watermark
+
+    def prune_changes(self, watermark):
+        with self.model_cls.new_context(self.graph) as context:
+            prune_changes(context.session, self.model_cls, watermark)
+            context.commit()
+        return self
+
+    def stream(self, session):
+        """
+        Iterate over every instance of the model class, a batch at a time.
+
+        """
+        statement = select(self.model_cls).execution_options(
+            stream_results=True,
+            yield_per=self.batch_size,
+        )
+        for batch in session.execute(statement).scalars().partitions():
+            yield from batch
 
-    def get_columns(self):
-        return {
-            key
-            for key in self.model_cls.__mapper__.columns.keys()
-        }
+            # NB the batch has been written by the time the next one is requested
+            for item in batch:
+                session.expunge(item)
@@ -0,0 +1,52 @@
+"""
+JSON Lines-based dumping.
+
+"""
+from datetime import date, datetime
+from enum import Enum
+from json import dumps
+
+from microcosm_sqlite.compression import open_text
+from microcosm_sqlite.dumpers.base import TableDumper
+
+
+def to_json(value):
+    """
+    Serialize values that JSON does not support natively.
+
+    """
+    if isinstance(value, Enum):
+        # NB as persisted by `EnumType`
+        return value.name
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class JSONLinesDumper(TableDumper):
+    """
+    JSON Lines-based dumper, writing one object per row.
+
+    Whole-table dumps always use the tuple path; `items` are dumped by their members.
+
+    """
+    def dump(self, fileobj, items=None, field_names=None):
+        field_names = list(field_names or self.get_columns())
+
+        with open_text(fileobj, self.compression, mode="w") as fileobj:
+            with self.model_cls.new_context(self.graph) as context:
+                if items is None:
+                    batches = self.select_rows(context.session, field_names)
+                else:
+                    batches = [
+                        [
+                            [getattr(item, name) for name in field_names]
+                            for item in items
+                        ],
+                    ]
+
+                for rows in batches:
+                    fileobj.writelines(
+                        dumps(dict(zip(field_names, row)), default=to_json) + "\n"
+                        for row in rows
+                    )
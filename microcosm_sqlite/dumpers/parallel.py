@@ -0,0 +1,171 @@
+"""
+Parallel dumping.
+
+Tables (or primary key ranges of a table) are dumped concurrently by worker processes,
+each reading through its own connection, into one CSV file apiece.
+
+"""
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from os.path import join
+
+from sqlalchemy import create_engine, func, select
+
+from microcosm_sqlite.dumpers.csv import DEFAULT_BATCH_SIZE, CSVDumper
+
+
+def primary_key_of(model_cls):
+    primary_key = model_cls.__table__.primary_key.columns
+    if len(primary_key) != 1:
+        raise ValueError(f"Cannot shard a table without a single column primary key: {model_cls}")
+
+    column, = primary_key
+    return column
+
+
+def primary_key_ranges(connection, model_cls, shards):
+    """
+    Split a table into (at most) `shards` primary key ranges of similar row counts.
+
+    Ranges are (lower, upper) pairs, including lower and excluding upper bounds; the first
+    and last range are unbounded (`None`) below and above.
+
+    """
+    column = primary_key_of(model_cls)
+
+    # NB a single pass over the primary key index numbers rows into (at most) `shards`
+    # buckets of similar sizes; each bucket after the first starts a range
+    buckets = select(
+        column.label("key"),
+        func.ntile(shards).over(order_by=column).label("bucket"),
+    ).subquery()
+    boundaries = connection.execute(
+        select(func.min(buckets.c.key)).group_by(buckets.c.bucket).order_by(buckets.c.bucket),
+    ).scalars().all()[1:]
+
+    bounds = [None, *boundaries, None]
+    return list(zip(bounds, bounds[1:]))
+
+
+def range_criteria(model_cls, lower, upper):
+    column = primary_key_of(model_cls)
+    criteria = []
+    if lower is not None:
+        criteria.append(column >= lower)
+    if upper is not None:
+        criteria.append(column < upper)
+    return criteria
+
+
+def dump_table(path, model_cls, field_names, batch_size, output_path, bounds=None):
+    """
+    Dump a table (or a primary key range of it) into a CSV file.
+
+    Runs in a worker process, reading through a new engine.
+
+    """
+    dumper = CSVDumper(None, None, model_cls, batch_size=batch_size).local_table()
+    criteria = () if bounds is None else range_criteria(model_cls, *bounds)
+
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        with engine.connect() as connection:
+            with open(output_path, "w", newline="") as fileobj:
+                dumper.write_tuples(connection, fileobj, field_names, criteria=criteria)
+    finally:
+        engine.dispose()
+
+    return output_path
+
+
+class ParallelDumper:
+    """
+    Dump every mapped table of a data set concurrently, one CSV file per table.
+
+    Each file holds the columns of its own table only (so joined-table inheritance
+    subclasses dump their own columns, alongside their base class' table).
+
+    Tables configured with `shard()` are instead split into primary key ranges of similar
+    size, dumped concurrently into one file per range (each with a header).
+
+    Workers read outside of the data set's sessions, so the data set must be persisted
+    to a file; in WAL mode, dumps do not block (nor wait on) writers.
+
+    """
+    def __init__(
+        self,
+        graph,
+        data_set,
+        workers=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+    ):
+        self.graph = graph
+        self.data_set = data_set.resolve()
+        self.name = self.data_set.__name__
+        self.workers = workers or cpu_count()
+        self.batch_size = batch_size
+        self.shards = dict()
+
+        self.path = graph.sqlite.path_for(self.name)
+        if self.path == ":memory:":
+            raise ValueError(f"Cannot dump in-memory data set in parallel: {self.name}")
+
+    def shard(self, model_cls, shards):
+        self.shards[model_cls.__table__.name] = shards
+        return self
+
+    def get_models(self):
+        """
+        Return one model class per mapped table.
+
+        """
+        models = dict()
+        for mapper in self.data_set.registry.mappers:
+            models.setdefault(mapper.local_table.name, mapper.class_)
+        return [models[name] for name in sorted(models)]
+
+    def dump(self, directory, model_classes=None):
+        """
+        Dump into a directory.
+
+        :returns: the paths of the files written, by table name
+
+        """
+        jobs = []
+        for model_cls in model_classes or self.get_models():
+            name = model_cls.__table__.name
+            field_names = list(model_cls.__table__.columns.keys())
+
+            if name not in self.shards:
+                jobs.append((name, model_cls, field_names, join(directory, f"{name}.csv"), None))
+                continue
+
+            engine, _ = self.graph.sqlite(self.name)
+            with engine.connect() as connection:
+                ranges = primary_key_ranges(connection, model_cls, self.shards[name])
+
+            for index, bounds in enumerate(ranges):
+                output_path = join(directory, f"{name}.{index:04d}.csv")
+                jobs.append((name, model_cls, field_names, output_path, bounds))
+
+        paths = dict()
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs) or 1)) as executor:
+            futures = [
+                (
+                    name,
+                    executor.submit(
+                        dump_table,
+                        self.path,
+                        model_cls,
+                        field_names,
+                        self.batch_size,
+                        output_path,
+                        bounds,
+                    ),
+                )
+                for name, model_cls, field_names, output_path, bounds in jobs
+            ]
+            for name, future in futures:
+                paths.setdefault(name, []).append(future.result())
+
+        return paths
@@ -0,0 +1,118 @@
+"""
+Parquet and Arrow-based dumping.
+
+Requires the `pyarrow` package (e.g. via the `parquet` extra).
+
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+
+from microcosm_sqlite.dumpers.base import TableDumper
+
+
+def arrow_type_for(column):
+    """
+    Resolve the Arrow type of a column from its Python type, defaulting to strings.
+
+    """
+    import pyarrow
+
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return pyarrow.string()
+
+    # NB bool is an int, so must be resolved first
+    for base, arrow_type in (
+        (bool, pyarrow.bool_()),
+        (int, pyarrow.int64()),
+        (float, pyarrow.float64()),
+        (Decimal, pyarrow.float64()),
+        (bytes, pyarrow.binary()),
+        (datetime, pyarrow.timestamp("us")),
+        (date, pyarrow.date32()),
+    ):
+        if issubclass(python_type, base):
+            return arrow_type
+
+    return pyarrow.string()
+
+
+def to_arrow(arrow_type, values):
+    import pyarrow
+
+    if pyarrow.types.is_string(arrow_type):
+        # NB enums are persisted (and dumped) by name, see `EnumType`
+        values = [
+            value.name if isinstance(value, Enum) else value
+            for value in values
+        ]
+    elif pyarrow.types.is_floating(arrow_type):
+        values = [
+            None if value is None else float(value)
+            for value in values
+        ]
+    return pyarrow.array(values, type=arrow_type)
+
+
+class ParquetDumper(TableDumper):
+    """
+    Parquet-based dumper, writing each batch of result rows as a record batch.
+
+    Dumps are of whole (optionally filtered) tables; `compression` is the Parquet codec
+    (e.g. "snappy", "gzip" or "zstd").
+
+    """
+    def dump(self, target, field_names=None, criteria=()):
+        """
+        Dump into a path or (binary) file object.
+
+        """
+        field_names = list(field_names or self.get_columns())
+        schema = self.schema_for(field_names)
+
+        with self.model_cls.new_context(self.graph) as context:
+            batches = self.select_rows(context.session, field_names, criteria)
+            with self.open_writer(target, schema) as writer:
+                for rows in batches:
+                    writer.write_batch(self.record_batch(schema, rows))
+
+    def schema_for(self, field_names):
+        try:
+            import pyarrow
+        except ImportError as error:
+            raise ImportError("Parquet outputs require the `pyarrow` package") from error
+
+        columns = self.model_cls.__mapper__.columns
+        return pyarrow.schema([
+            pyarrow.field(name, arrow_type_for(columns[name]), nullable=columns[name].nullable)
+            for name in field_names
+        ])
+
+    def record_batch(self, schema, rows):
+        import pyarrow
+
+        return pyarrow.record_batch(
+            [
+                to_arrow(field.type, values)
+                for field, values in zip(schema, zip(*rows))
+            ],
+            schema=schema,
+        )
+
+    def open_writer(self, target, schema):
+        from pyarrow.parquet import ParquetWriter
+
+        return ParquetWriter(target, schema, compression=self.compression or "snappy")
+
+
+class ArrowDumper(ParquetDumper):
+    """
+    Arrow IPC file-based dumper; `compression` is the IPC codec ("lz4" or "zstd").
+
+    """
+    def open_writer(self, target, schema):
+        from pyarrow.ipc import IpcWriteOptions, new_file
+
+        return new_file(target, schema, options=IpcWriteOptions(compression=self.compression))
@@ -38,3 +38,10 @@ class DuplicateModelError(ModelIntegrityError):
 
 class MultipleModelsFoundError(ModelIntegrityError):
     pass
+
+
+class InvalidCursorError(SQLiteError):
+
+    @property
+    def status_code(self):
+        return 400
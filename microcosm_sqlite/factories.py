@@ -9,6 +9,8 @@ from microcosm.api import defaults
 from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
 
+from microcosm_sqlite.caching import listen_for_writes
+
 
 def on_connect_listener(use_foreign_keys):
     def on_connect(dbapi_connection, _):
@@ -68,16 +70,31 @@ class SQLiteBindFactory:
 
         """
         if name not in self.datasets:
-            path = self.paths.get(name, self.default_path)
-            engine = create_engine(f"sqlite:///{path}", echo=self.echo)
-
-            event.listen(engine, "connect", on_connect_listener(self.use_foreign_keys))
-            if not self.read_only:
-                # We only need to use transactions if we're not in read_only mode
-                event.listen(engine, "begin", on_begin_listener)
-
+            engine = self.create_engine(self.path_for(name))
             Session = sessionmaker(bind=engine, autocommit=self.autocommit)
+            listen_for_writes(Session)
 
             self.datasets[name] = engine, Session
 
         return self.datasets[name]
+
+    def path_for(self, name):
+        """
+        Return the configured path for the named sqlite database.
+
+        """
+        return self.paths.get(name, self.default_path)
+
+    def create_engine(self, path):
+        """
+        Create an engine for a sqlite database path (without caching it).
+
+        """
+        engine = create_engine(f"sqlite:///{path}", echo=self.echo)
+
+        event.listen(engine, "connect", on_connect_listener(self.use_foreign_keys))
+        if not self.read_only:
+            # We only need to use transactions if we're not in read_only mode
+            event.listen(engine, "begin", on_begin_listener)
+
+        return engine
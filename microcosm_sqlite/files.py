@@ -0,0 +1,27 @@
+"""
+File publishing.
+
+"""
+from os import chmod, stat
+from stat import S_IMODE
+
+
+# The mode of published files that do not replace an existing file.
+DEFAULT_MODE = 0o644
+
+
+def publish_mode(staging_path, path):
+    """
+    Give a staging file the permissions it will have once renamed over a path.
+
+    `mkstemp` creates files readable by their owner only; published files keep the mode
+    of the file they replace, or else get `DEFAULT_MODE`.
+
+    """
+    try:
+        mode = S_IMODE(stat(path).st_mode)
+    except FileNotFoundError:
+        # NB reading the umask means (briefly) setting it for every thread
+        mode = DEFAULT_MODE
+
+    chmod(staging_path, mode)
@@ -0,0 +1,94 @@
+"""
+Online snapshots.
+
+"""
+from os import (
+    close,
+    fspath,
+    remove,
+    replace,
+)
+from os.path import abspath, basename, dirname
+from shutil import copyfileobj
+from sqlite3 import connect
+from tempfile import mkstemp
+
+from microcosm_sqlite.compression import compressed_stream
+from microcosm_sqlite.files import publish_mode
+
+
+# The number of pages copied per backup step; the source is only locked during a step.
+DEFAULT_PAGES = 1024
+
+
+def snapshot(engine, destination, pages=DEFAULT_PAGES, sleep=0.0, vacuum=False, compression=None):
+    """
+    Copy a live database into a file, without blocking writers for long.
+
+    By default, the online backup API copies the database `pages` at a time (releasing
+    its read lock and sleeping `sleep` seconds between steps), restarting a step if a
+    writer of another connection changed the database meanwhile. `VACUUM INTO` instead
+    writes a compacted copy in a single read transaction.
+
+    Snapshots are written next to the destination and renamed over it, optionally compressed
+    ("gzip" or "zstd").
+
+    :returns: the destination path
+
+    """
+    destination = abspath(fspath(destination))
+    fd, staging_path = mkstemp(
+        dir=dirname(destination),
+        prefix=f".{basename(destination)}.",
+        suffix=".snapshot",
+    )
+    close(fd)
+
+    try:
+        source = engine.raw_connection()
+        try:
+            if vacuum:
+                # NB VACUUM INTO requires that its target does not exist
+                remove(staging_path)
+                source.execute("VACUUM INTO ?", (staging_path,))
+            else:
+                target = connect(staging_path)
+                try:
+                    source.backup(target, pages=pages, sleep=sleep)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+
+        if compression is not None:
+            compress(staging_path, compression)
+
+        publish_mode(staging_path, destination)
+        replace(staging_path, destination)
+    except BaseException:
+        try:
+            remove(staging_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return destination
+
+
+def compress(path, compression):
+    """
+    Compress a file in place.
+
+    """
+    compressed_path = f"{path}.compressed"
+    try:
+        with open(path, "rb") as source, open(compressed_path, "wb") as target:
+            with compressed_stream(target, compression, "w") as stream:
+                copyfileobj(source, stream)
+        replace(compressed_path, path)
+    except BaseException:
+        try:
+            remove(compressed_path)
+        except FileNotFoundError:
+            pass
+        raise
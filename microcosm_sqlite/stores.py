@@ -6,9 +6,20 @@ from abc import ABCMeta, abstractmethod
 from contextlib import contextmanager
 from threading import local
 
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import (
+    bindparam,
+    insert,
+    inspect,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
+from sqlalchemy.sql.operators import desc_op
 
+from microcosm_sqlite.caching import ResultCache, has_writes, mark_written
+from microcosm_sqlite.constants import SQLITE_MAX_VARIABLE_NUMBER
+from microcosm_sqlite.cursors import decode_cursor, encode_cursor
 from microcosm_sqlite.errors import (
     DuplicateModelError,
     ModelIntegrityError,
@@ -17,6 +28,16 @@ from microcosm_sqlite.errors import (
 )
 
 
+# The default number of rows written per `executemany`.
+DEFAULT_BATCH_SIZE = 1000
+
+
+def integrity_error_for(error):
+    if "UNIQUE constraint failed" in str(error):
+        return DuplicateModelError(error)
+    return ModelIntegrityError(error)
+
+
 def get_session(store):
     """
     Return the current session or raise an error.
@@ -78,11 +99,31 @@ class Store(metaclass=ABCMeta):
     """
     A persistence layer for SQLite-backed models.
 
+    Stores declaring `keyset_fields` (columns, all ascending or all descending, ending with
+    a unique column) support keyset pagination: `search()` and `first()` accept the cursor
+    of the last seen instance (see `cursor_for()`) as `after`, and seek past it with an
+    (indexable) row value comparison instead of scanning an `offset`. Results are ordered
+    by the keyset fields, unless `_order_by` is overridden (to the same order).
+
+    Stores declaring a `result_cache` (see `ResultCache`) cache the results of `one()`,
+    `first()` and `search()` by their arguments, until the data set is written to.
+
+    Stores setting `cache_statements` reuse the queries of `count()`, `one()`, `first()`
+    and `search()` (without `after` or other non-auto-filter arguments) across auto-filter
+    values and pagination: queries are built once per shape (the auto-filter fields present
+    and whether pagination is used), with auto-filter values, offset and limit as bound
+    parameters, so that their compiled statements are also reused from SQLAlchemy's
+    compiled cache. Such stores must only use auto-filter arguments for auto-filtering.
+
     """
     auto_filter_fields: list | None = None
+    keyset_fields: list | None = None
+    result_cache: ResultCache | None = None
+    cache_statements = False
 
     def __init__(self, get_session=get_session):
         self.get_session = get_session
+        self.queries = dict()
         self.auto_filters = {
             auto_filter_field.name: auto_filter_field
             for auto_filter_field in (
@@ -104,6 +145,10 @@ class Store(metaclass=ABCMeta):
         Count the number of models matching some criterion.
 
         """
+        cached = self._cached_query("count", **kwargs)
+        if cached is not None:
+            return cached.count()
+
         query = self._query()
         query = self._filter(query, **kwargs)
         return query.count()
@@ -117,6 +162,44 @@ class Store(metaclass=ABCMeta):
             self.session.add(instance)
         return instance
 
+    def create_many(self, rows, batch_size=DEFAULT_BATCH_SIZE, failures=None):
+        """
+        Create many models, with one `executemany` per batch.
+
+        :param rows: model instances or dicts of their attribute values
+        :param failures: a list to append failing rows to (as `(row, error)` pairs); if
+                         given, failing batches are retried row by row (within savepoints)
+                         instead of raising
+        :returns: the number of models created
+
+        """
+        return self._write_many(self._insert_rows, rows, batch_size, failures)
+
+    def update_many(self, rows=None, values=None, batch_size=DEFAULT_BATCH_SIZE, failures=None, **kwargs):
+        """
+        Update many models, either by primary key or by filter.
+
+        Either pass `rows` (model instances or dicts of their attribute values, including
+        their primary key) to update each by primary key, with one `executemany` per batch,
+        or `values` to update every model matching the filter arguments.
+
+        :param failures: as for `create_many()`, when updating by primary key; rows whose
+                         primary key is missing fail with `ModelNotFoundError`
+        :returns: the number of models updated
+
+        """
+        if (rows is None) == (values is None):
+            raise ValueError("Update many models either by rows or by values")
+
+        if rows is not None:
+            return self._write_many(self._update_rows, rows, batch_size, failures)
+
+        query = self._query()
+        query = self._filter(query, **kwargs)
+
+        with self.flushing():
+            return query.update(values, synchronize_session=False)
+
     def delete(self, **kwargs):
         """
         Delete a model or raise an error if not found.
@@ -133,20 +216,30 @@ class Store(metaclass=ABCMeta):
 
         return True
 
-    def first(self, offset=None, limit=None, **kwargs):
+    def first(self, offset=None, limit=None, after=None, **kwargs):
         """
         Returns the first match based on criteria or None.
 
         :param offset: pagination offset, if any
         :param limit: pagination limit, if any
+        :param after: keyset pagination cursor, if any
 
         """
+        return self._cached("first", self._first, offset=offset, limit=limit, after=after, **kwargs)
+
+    def _first(self, offset=None, limit=None, after=None, **kwargs):
+        if after is None:
+            cached = self._cached_query("first", offset=offset, limit=limit, **kwargs)
+            if cached is not None:
+                return cached.first()
+
         # Note that the ordering here is important.  In order to produce valid
         # SQL, _order_by must occur before _paginate, and _filter must occur
         # before _order_by.
         query = self._query()
         query = self._filter(query, **kwargs)
         query = self._order_by(query, **kwargs)
+        query = self._seek(query, after=after)
         query = self._paginate(query, offset=offset, limit=limit)
         return query.first()
 
@@ -158,6 +251,18 @@ class Store(metaclass=ABCMeta):
         :param limit: pagination limit, if any
 
         """
+        return self._cached("one", self._one, offset=offset, limit=limit, **kwargs)
+
+    def _one(self, offset=None, limit=None, **kwargs):
+        cached = self._cached_query("one", offset=offset, limit=limit, **kwargs)
+        if cached is not None:
+            try:
+                return cached.one()
+            except NoResultFound as error:
+                raise ModelNotFoundError(error)
+            except MultipleResultsFound as error:
+                raise MultipleModelsFoundError(error)
+
         # Note that the ordering here is important.  In order to produce valid
         # SQL, _order_by must occur before _paginate, and _filter must occur
         # before _order_by.
@@ -172,24 +277,243 @@ class Store(metaclass=ABCMeta):
         except MultipleResultsFound as error:
             raise MultipleModelsFoundError(error)
 
-    def search(self, offset=None, limit=None, **kwargs):
+    def search(self, offset=None, limit=None, after=None, **kwargs):
         """
         Return the list of models matching some criterion.
 
         :param offset: pagination offset, if any
         :param limit: pagination limit, if any
+        :param after: keyset pagination cursor, if any
 
         """
+        return self._cached("search", self._search, offset=offset, limit=limit, after=after, **kwargs)
+
+    def _search(self, offset=None, limit=None, after=None, **kwargs):
+        if after is None:
+            cached = self._cached_query("search", offset=offset, limit=limit, **kwargs)
+            if cached is not None:
+                return cached.all()
+
         # Note that the ordering here is important.  In order to produce valid
         # SQL, _order_by must occur before _paginate, and _filter must occur
         # before _order_by.
         query = self._query()
         query = self._filter(query, **kwargs)
         query = self._order_by(query, **kwargs)
+        query = self._seek(query, after=after)
         query = self._paginate(query, offset=offset, limit=limit)
 
         return query.all()
 
+    def iter_search(self, batch_size=DEFAULT_BATCH_SIZE, after=None, **kwargs):
+        """
+        Iterate over the models matching some criterion, loading a batch at a time.
+
+        Each batch is expunged from the session once consumed (except for instances that
+        were already in the session), so that iterating over large results uses constant
+        memory. Use `after` (rather than `offset` or `limit`) to resume iterating.
+
+        :param batch_size: the number of models loaded per batch
+        :param after: keyset pagination cursor, if any
+
+        """
+        paginated = [key for key in ("offset", "limit") if kwargs.get(key) is not None]
+        if paginated:
+            raise ValueError(f"Cannot iterate over search results with pagination: {', '.join(paginated)}")
+
+        # NB validate arguments before (lazily) iterating
+        return self._iter_search(batch_size, after, **kwargs)
+
+    def _iter_search(self, batch_size, after, **kwargs):
+        session = self.session
+        held = set(session.identity_map.keys())
+
+        query = self._query()
+        query = self._filter(query, **kwargs)
+        query = self._order_by(query, **kwargs)
+        query = self._seek(query, after=after)
+
+        batch = []
+        try:
+            for instance in query.yield_per(batch_size):
+                if len(batch) == batch_size:
+                    self._expunge(session, batch)
+                    batch = []
+
+                if inspect(instance).identity_key not in held:
+                    batch.append(instance)
+                yield instance
+        finally:
+            self._expunge(session, batch)
+
+    def get_many(self, ids, **kwargs):
+        """
+        Return the models with some (single column) primary keys, keyed by primary key.
+
+        Missing models are omitted.
+
+        """
+        primary_key = self.model_class.__mapper__.primary_key
+        if len(primary_key) != 1:
+            raise ValueError(f"Cannot get many models without a single column primary key: {self.model_class}")
+
+        column, = primary_key
+        key = self.model_class.__mapper__.get_property_by_column(column).key
+        return {
+            value: instances[0]
+            for value, instances in self.search_by(key, ids, **kwargs).items()
+        }
+
+    def search_by(self, field, values, batch_size=None, **kwargs):
+        """
+        Return the models matching any of some field values, grouped by value.
+
+        Values are queried in batches of `IN` clauses that fit within SQLite's limit on
+        host parameters, leaving room for any other filter arguments.
+
+        :param field: a model attribute (or its name)
+        :param batch_size: the number of values per query, if not the default
+
+        """
+        if isinstance(field, str):
+            field = getattr(self.model_class, field)
+
+        # NB leave half of the host parameters to filters
+        batch_size = batch_size or SQLITE_MAX_VARIABLE_NUMBER // 2
+        values = list(dict.fromkeys(values))
+
+        results = dict()
+        for start in range(0, len(values), batch_size):
+            # NB query the model alone, as filters may combine queries (e.g. with `except_`)
+            query = self._query()
+            query = self._filter(query, **kwargs)
+            query = query.filter(field.in_(values[start:start + batch_size]))
+
+            for instance in query:
+                results.setdefault(getattr(instance, field.key), []).append(instance)
+
+        return results
+
+    def _write_many(self, write, rows, batch_size, failures=None):
+        """
+        Write rows in batches, checking how many rows each batch affected.
+
+        :param write: a function writing a batch of rows, returning the number written
+
+        """
+        session = self.session
+        values = [self._values_of(row) for row in rows]
+
+        count = 0
+        for start in range(0, len(values), batch_size):
+            batch = values[start:start + batch_size]
+
+            if failures is None:
+                with self.flushing():
+                    written = write(session, batch)
+                if written < len(batch):
+                    session.rollback()
+                    raise ModelNotFoundError(f"{len(batch) - written} of {len(batch)} models not found")
+                count += written
+                continue
+
+            try:
+                with session.begin_nested():
+                    if write(session, batch) < len(batch):
+                        # NB roll back the batch to find its missing rows
+                        raise ModelNotFoundError
+                count += len(batch)
+                continue
+            except (IntegrityError, ModelNotFoundError):
+                pass
+
+            for row in batch:
+                try:
+                    with session.begin_nested():
+                        if not write(session, [row]):
+                            raise ModelNotFoundError(f"Model not found: {row}")
+                    count += 1
+                except IntegrityError as error:
+                    failures.append((row, integrity_error_for(error)))
+                except ModelNotFoundError as error:
+                    failures.append((row, error))
+
+        # NB bulk statements bypass the session's flush events
+        mark_written(session)
+        return count
+
+    def _insert_rows(self, session, rows):
+        table = self.model_class.__table__
+        for keys, group in self._by_columns(rows):
+            session.execute(insert(table), group)
+
+        # NB rows are either inserted or raise
+        return len(rows)
+
+    def _update_rows(self, session, rows):
+        table = self.model_class.__table__
+        primary_key = table.primary_key.columns
+
+        count = 0
+        for keys, group in self._by_columns(rows):
+            if any(column.key not in keys for column in primary_key):
+                raise ValueError(f"Cannot update models by primary key without their primary key: {group[0]}")
+            if all(key in primary_key for key in keys):
+                raise ValueError(f"Cannot update models by primary key without values to update: {group[0]}")
+
+            statement = update(table).where(
+                *(column == bindparam(f"pk_{column.key}") for column in primary_key)
+            ).values({
+                key: bindparam(key)
+                for key in keys
+                if key not in primary_key
+            })
+            result = session.execute(
+                statement,
+                [
+                    {
+                        f"pk_{key}" if key in primary_key else key: value
+                        for key, value in row.items()
+                    }
+                    for row in group
+                ],
+            )
+            count += result.rowcount
+
+        return count
+
+    def _by_columns(self, rows):
+        """
+        Group rows by their (column keyed) keys, as `executemany` expects uniform rows.
+
+        """
+        column_keys = {
+            attr.key: attr.columns[0].key
+            for attr in self.model_class.__mapper__.column_attrs
+        }
+
+        groups = dict()
+        for row in rows:
+            values = {column_keys[key]: value for key, value in row.items()}
+            groups.setdefault(frozenset(values), []).append(values)
+        return groups.items()
+
+    def _expunge(self, session, instances):
+        for instance in instances:
+            if instance in session:
+                session.expunge(instance)
+
+    def _values_of(self, row):
+        if isinstance(row, dict):
+            return row
+
+        # NB only attributes that were set, so that column defaults apply
+        return {
+            attr.key: getattr(row, attr.key)
+            for attr in self.model_class.__mapper__.column_attrs
+            if attr.key in row.__dict__
+        }
+
     def _query(self):
         """
         Construct a query for the model.
@@ -221,15 +545,153 @@ class Store(metaclass=ABCMeta):
 
         return query
 
+    def _cached_query(self, method, offset=None, limit=None, **kwargs):
+        """
+        Return a cached query (bound to the current session and parameters), if cached.
+
+        """
+        if not self.cache_statements:
+            return None
+
+        if any(
+            value is not None
+            for key, value in kwargs.items()
+            if key not in self.auto_filters
+        ):
+            # NB other filter arguments may shape queries arbitrarily
+            return None
+
+        auto_kwargs = {
+            key: value
+            for key, value in kwargs.items()
+            if key in self.auto_filters and value is not None
+        }
+
+        key = (
+            method,
+            frozenset(auto_kwargs),
+            offset is not None,
+            limit is not None,
+        )
+        query = self.queries.get(key)
+
+        if query is None:
+            query = self._build_query(
+                method,
+                offset=None if offset is None else bindparam("offset"),
+                limit=None if limit is None else bindparam("limit"),
+                **{key: bindparam(f"auto_{key}") for key in auto_kwargs},
+            )
+            self.queries[key] = query
+
+        params = {f"auto_{key}": value for key, value in auto_kwargs.items()}
+        if offset is not None:
+            params.update(offset=offset)
+        if limit is not None:
+            params.update(limit=limit)
+
+        return query.with_session(self.session).params(**params)
+
+    def _build_query(self, method, offset=None, limit=None, **kwargs):
+        # NB the same steps as for uncached queries
+        query = self._query()
+        query = self._filter(query, **kwargs)
+        if method == "count":
+            return query
+
+        query = self._order_by(query, **kwargs)
+        return self._paginate(query, offset=offset, limit=limit)
+
+    def _cached(self, method, load, **kwargs):
+        if self.result_cache is None:
+            return load(**kwargs)
+
+        try:
+            key = (type(self), method, frozenset(kwargs.items()))
+        except TypeError:
+            # e.g. filtering by a list
+            return load(**kwargs)
+
+        session = self.session
+        if has_writes(session):
+            # NB neither expose uncommitted writes to, nor merge them from, other sessions
+            return load(**kwargs)
+
+        result = self.result_cache.get_or_load(session, key, lambda: load(**kwargs))
+        try:
+            return self._merged(session, result)
+        except InvalidRequestError:
+            # NB cached instances were modified (but not flushed), so cannot be merged
+            self.result_cache.forget(session, key)
+            return load(**kwargs)
+
+    def _merged(self, session, result):
+        """
+        Merge cached results into the current session (without loading them).
+
+        Each session gets its own instances, which can lazy load their relationships.
+
+        """
+        if result is None:
+            return None
+        if isinstance(result, list):
+            return [session.merge(instance, load=False) for instance in result]
+        return session.merge(result, load=False)
+
+    def cursor_for(self, instance):
+        """
+        Return the keyset pagination cursor of an instance (e.g. the last of a page).
+
+        """
+        columns, _ = self._keyset()
+        return encode_cursor(
+            getattr(instance, column.key)
+            for column in columns
+        )
+
     def _order_by(self, query, **kwargs):
         """
         Add an order by clause to a (search) query.
 
-        By default, is a noop.
+        By default, orders by the keyset fields, if any, and is otherwise a noop.
 
         """
+        if self.keyset_fields:
+            return query.order_by(*self.keyset_fields)
         return query
 
+    def _keyset(self):
+        """
+        Resolve the keyset fields into columns and their (shared) direction.
+
+        """
+        if not self.keyset_fields:
+            raise ValueError(f"Keyset pagination requires keyset_fields: {type(self).__name__}")
+
+        columns, descending = [], set()
+        for field in self.keyset_fields:
+            is_descending = getattr(field, "modifier", None) is desc_op
+            descending.add(is_descending)
+            columns.append(field.element if is_descending else field)
+
+        if len(descending) > 1:
+            raise ValueError("Keyset fields must be all ascending or all descending")
+
+        return columns, descending.pop()
+
+    def _seek(self, query, after=None):
+        """
+        Skip rows up to (and including) a keyset pagination cursor.
+
+        """
+        if after is None:
+            return query
+
+        columns, descending = self._keyset()
+        keys = tuple_(*columns)
+        values = tuple_(*decode_cursor(after, columns))
+        return query.filter(keys < values if descending else keys > values)
+
     def _paginate(self, query, offset=None, limit=None):
         """
         Handle limit and offset.
@@ -261,7 +723,4 @@ class Store(metaclass=ABCMeta):
             self.session.flush()
         except IntegrityError as error:
             self.session.rollback()
-
-            if "UNIQUE constraint failed" in str(error):
-                raise DuplicateModelError(error)
-            raise ModelIntegrityError(error)
+            raise integrity_error_for(error)
@@ -52,7 +52,7 @@ class Dog(IdentityMixin, Example):
     __tablename__ = "dog"
 
     id = mapped_column(Integer, primary_key=True)
-    name = mapped_column(String, nullable=False)
+    name = mapped_column(String, nullable=False, index=True)
     is_a_good_boy = mapped_column(Boolean, nullable=False, default=True)
     owner_id = mapped_column(Integer, ForeignKey(Person.id), nullable=False)
     owner = relationship(Person)
@@ -67,6 +67,11 @@ class PersonStore(Store):
     auto_filter_fields = [
         model_class.first,
     ]
+    keyset_fields = [
+        model_class.first,
+        model_class.last,
+        model_class.id,
+    ]
 
     def _filter(self, query, last=None, **kwargs):
         if last is not None:
@@ -80,6 +85,7 @@ class PersonStore(Store):
         return query.order_by(
             Person.first.asc(),
             Person.last.asc(),
+            Person.id.asc(),
         )
 
 
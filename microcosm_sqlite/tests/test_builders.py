@@ -2,20 +2,48 @@
 Test database building.
 
 """
-from io import StringIO
-from tempfile import NamedTemporaryFile
+from gzip import open as gzip_open
+from io import BytesIO, StringIO
+from os import chmod, listdir, stat
+from os.path import dirname, join
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 from textwrap import dedent
+from unittest.mock import patch
 
 from hamcrest import (
     assert_that,
+    calling,
     contains,
+    contains_inanyorder,
+    empty,
     equal_to,
+    greater_than,
     has_properties,
     is_,
+    raises,
+    starts_with,
 )
 from microcosm.api import create_object_graph
 from microcosm.loaders import load_from_dict
-
+from pyarrow import Table
+from pyarrow.parquet import write_table
+from sqlalchemy import (
+    Column,
+    Integer,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.exc import IntegrityError
+from zstandard import ZstdCompressor
+
+from microcosm_sqlite.builders.checkpoints import checkpoints
+from microcosm_sqlite.builders.converters import RowConverter, as_tuple
+from microcosm_sqlite.builders.parallel import read_header, split_ranges
+from microcosm_sqlite.builders.quarantine import CSVRejectSink, TableRejectSink, rejects
+from microcosm_sqlite.builders.writers import MergeWriter, row_hashes
+from microcosm_sqlite.context import SessionContext
+from microcosm_sqlite.errors import ModelIntegrityError
 from microcosm_sqlite.tests.fixtures import (
     Dog,
     DogStore,
@@ -212,3 +240,724 @@ class TestCSVBuilders:
              2,Dell
         """))
         self.builder.csv(Person).default(last="Curry").build(people)
+
+    def test_build_with_chunked_csv_builder(self):
+        self.builder.csv(Person).chunked(chunk_size=1).build(self.people)
+        self.builder.csv(Dog).chunked(chunk_size=2).build(self.dogs)
+
+        with Example.new_context(self.graph):
+            dogs = self.dog_store.search()
+            people = self.person_store.search()
+
+            assert_that(
+                dogs,
+                contains(
+                    has_properties(
+                        name="Reza",
+                        is_a_good_boy=True,
+                    ),
+                    has_properties(
+                        name="Rocco",
+                        is_a_good_boy=True,
+                    ),
+                    has_properties(
+                        name="Rookie",
+                        is_a_good_boy=True,
+                    ),
+                ),
+            )
+            assert_that(dogs[0].owner, is_(equal_to(people[1])))
+
+    def test_build_with_chunked_bulk_csv_builder_delete_before_load(self):
+        self.builder.csv(Person).build(self.people)
+
+        people = csv(dedent("""
+            id,first
+             3,Draymond
+        """))
+        bulk_input = [
+            (Person, people),
+            (Dog, csv(dedent("""
+                id,name,owner_id
+                 1,Rocco,3
+            """))),
+        ]
+
+        self.builder.csv(
+            Example,
+            delete_before_load=True,
+        ).bulk().chunked().default(last="Green").build(bulk_input)
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.person_store.search(),
+                contains(
+                    has_properties(
+                        first="Draymond",
+                        last="Green",
+                    ),
+                ),
+            )
+            assert_that(self.dog_store.count(), is_(equal_to(1)))
+
+    def test_build_with_batched_commits(self):
+        bulk_input = [
+            (Person, self.people),
+            (Dog, self.dogs),
+        ]
+
+        with patch.object(
+            SessionContext,
+            "commit",
+            autospec=True,
+            side_effect=SessionContext.commit,
+        ) as commit:
+            self.builder.csv(Example, commit_every=2).bulk().build(bulk_input)
+
+        # two batches of two rows, then the final commit
+        assert_that(commit.call_count, is_(equal_to(3)))
+
+        with Example.new_context(self.graph):
+            assert_that(self.person_store.count(), is_(equal_to(2)))
+            assert_that(self.dog_store.count(), is_(equal_to(3)))
+
+    def test_build_with_batched_commits_checks_foreign_keys_on_commit(self):
+        bulk_input = [
+            (Dog, self.dogs),
+            (Person, self.people),
+        ]
+
+        assert_that(
+            calling(self.builder.csv(Example, commit_every=2).bulk().build).with_args(bulk_input),
+            raises(IntegrityError),
+        )
+
+    def test_build_reports_progress(self):
+        events = []
+
+        @self.builder.listen
+        def listener(event, progress):
+            events.append((event, progress.rows_inserted))
+
+        bulk_input = [
+            (Person, self.people),
+            (Dog, self.dogs),
+        ]
+        builder = self.builder.csv(Example).bulk().chunked(chunk_size=2)
+        builder.build(bulk_input)
+
+        assert_that(
+            events,
+            contains(
+                ("model_started", 0),
+                ("chunk", 2),
+                ("model_finished", 2),
+                ("model_started", 2),
+                ("chunk", 4),
+                ("chunk", 5),
+                ("model_finished", 5),
+                ("commit", 5),
+                ("build_finished", 5),
+            ),
+        )
+        assert_that(
+            builder.progress,
+            has_properties(
+                rows_parsed=5,
+                rows_rejected=0,
+                bytes_read=len(self.people.getvalue()) + len(self.dogs.getvalue()),
+                commits=1,
+            ),
+        )
+        assert_that(builder.progress.model_seconds, contains_inanyorder("person", "dog"))
+
+    def test_row_converter(self):
+        builder = self.builder.csv(Person).default(first="Seth", last="Curry")
+        converter = builder.converter_for(Person, ["id", "first", "unknown"])
+
+        assert_that(
+            builder.converter_for(Person, ("id", "first", "unknown")),
+            is_(converter),
+        )
+        assert_that(
+            converter.as_values(["1", "Stephen", "ignored"]),
+            is_(equal_to(dict(id="1", first="Stephen", last="Curry"))),
+        )
+        assert_that(
+            converter.as_model(["2"]),
+            has_properties(
+                id="2",
+                first=None,
+                last="Curry",
+            ),
+        )
+
+    def test_as_tuple_only_nulls_blanks(self):
+        columns = dict(count=("count", Column("count", Integer)))
+
+        assert_that(as_tuple(columns, "count", 0), is_(equal_to(("count", 0))))
+        assert_that(as_tuple(columns, "count", False), is_(equal_to(("count", False))))
+        assert_that(as_tuple(columns, "count", ""), is_(equal_to(("count", None))))
+
+    def test_build_with_fast_load(self):
+        bulk_input = [
+            (Person, self.people),
+            (Dog, self.dogs),
+        ]
+
+        self.builder.csv(Example).bulk().chunked().fast().build(bulk_input)
+
+        engine, _ = self.graph.sqlite("example")
+        assert_that(
+            [index["name"] for index in inspect(engine).get_indexes("dog")],
+            contains_inanyorder("ix_dog_name"),
+        )
+
+        with Example.new_context(self.graph) as context:
+            assert_that(self.dog_store.count(), is_(equal_to(3)))
+            assert_that(
+                context.session.execute(
+                    text("SELECT count(*) FROM sqlite_stat1 WHERE tbl = 'dog'"),
+                ).scalar(),
+                is_(equal_to(1)),
+            )
+            assert_that(
+                context.session.execute(text("PRAGMA synchronous")).scalar(),
+                is_(equal_to(2)),
+            )
+
+    def test_build_with_parallel_csv_builder(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "person.csv")
+            with open(path, "w") as fileobj:
+                fileobj.write("id,first,last\n")
+                for index in range(1, 101):
+                    fileobj.write(f"{index},First{index:03},Last\n")
+
+            self.builder.csv(Person).parallel(workers=2, range_size=64).build(path)
+
+        with Example.new_context(self.graph):
+            people = self.person_store.search()
+
+        assert_that(len(people), is_(equal_to(100)))
+        assert_that(people[0], has_properties(id=1, first="First001", last="Last"))
+        assert_that(people[-1], has_properties(id=100, first="First100", last="Last"))
+
+    def test_build_with_parallel_csv_builder_and_quoted_line_breaks(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "person.csv")
+            with open(path, "w") as fileobj:
+                fileobj.write("id,first,last\n")
+                for index in range(1, 51):
+                    fileobj.write(f'{index},"First\n""{index:03}""\nline",Last\n')
+
+            self.builder.csv(Person).parallel(workers=2, range_size=8).build(path)
+
+        with Example.new_context(self.graph):
+            people = self.person_store.search()
+
+        assert_that(len(people), is_(equal_to(50)))
+        assert_that(people[0], has_properties(id=1, first='First\n"001"\nline', last="Last"))
+        assert_that(people[-1], has_properties(id=50, first='First\n"050"\nline', last="Last"))
+
+    def test_split_ranges_as_found(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "person.csv")
+            with open(path, "w", newline="") as fileobj:
+                fileobj.write('id,first,last\n1,"A\nB",C\n2,D,E\n')
+
+            header, start = read_header(path)
+            ranges = split_ranges(path, start, range_size=1)
+
+            assert_that(header, contains("id", "first", "last"))
+            assert_that(next(ranges), is_(equal_to((14, 24))))
+            assert_that(list(ranges), contains((24, 30)))
+
+    def test_build_with_merge(self):
+        self.builder.csv(Person).build(self.people)
+
+        people = csv(dedent("""
+            id,first,last
+             1,Stephen,Curry
+             2,Klay,Thompson-Warrior
+             3,Draymond,Green
+        """))
+        counts = self.builder.csv(Person).merge().build(people)
+
+        assert_that(
+            counts[Person],
+            has_properties(
+                inserted=1,
+                updated=1,
+                deleted=0,
+                unchanged=1,
+            ),
+        )
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.person_store.search(),
+                contains(
+                    has_properties(first="Draymond", last="Green"),
+                    has_properties(first="Klay", last="Thompson-Warrior"),
+                    has_properties(first="Stephen", last="Curry"),
+                ),
+            )
+
+    def test_build_with_merge_counts_rows_by_key(self):
+        self.builder.csv(Person).build(self.people)
+
+        # a repeated key is inserted once, then updated
+        counts = self.builder.csv(Person).merge().build(csv(dedent("""
+            id,first,last
+             1,Stephen,Curry
+             3,Draymond,Green
+             3,Draymond,Green-Warrior
+        """)))
+        assert_that(
+            counts[Person],
+            has_properties(
+                inserted=1,
+                updated=1,
+                deleted=0,
+                unchanged=1,
+            ),
+        )
+
+        # changing the primary key of a row merged on a unique constraint updates it
+        counts = self.builder.csv(Person).merge(keys=["first", "last"]).build(csv(dedent("""
+            id,first,last
+             9,Klay,Thompson
+        """)))
+        assert_that(
+            counts[Person],
+            has_properties(
+                inserted=0,
+                updated=1,
+                deleted=0,
+                unchanged=0,
+            ),
+        )
+
+    def test_build_with_merge_without_key_columns(self):
+        people = csv(dedent("""
+            first,last
+            Stephen,Curry
+        """))
+
+        for builder in (
+            self.builder.csv(Person).merge(delete_missing=True),
+            self.builder.csv(Person).diff(),
+        ):
+            people.seek(0)
+            assert_that(
+                calling(builder.build).with_args(people),
+                raises(ValueError, "Cannot merge person without key columns"),
+            )
+
+    def test_build_with_merge_on_unique_constraint_and_delete_missing(self):
+        self.builder.csv(Person).build(self.people)
+
+        people = csv(dedent("""
+            id,first,last
+             5,Klay,Thompson
+             3,Draymond,Green
+        """))
+        counts = self.builder.csv(Person).merge(
+            keys=["first", "last"],
+            delete_missing=True,
+        ).build(people)
+
+        assert_that(
+            counts[Person],
+            has_properties(
+                inserted=1,
+                updated=1,
+                deleted=1,
+                unchanged=0,
+            ),
+        )
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.person_store.search(),
+                contains(
+                    has_properties(id=3, first="Draymond"),
+                    has_properties(id=5, first="Klay"),
+                ),
+            )
+
+    def test_build_with_diff(self):
+        counts = self.builder.csv(Person).diff().build(self.people)
+        assert_that(counts[Person], has_properties(inserted=2, updated=0, unchanged=0))
+
+        people = csv(dedent("""
+            id,first,last
+             2,Klay,Thompson-Warrior
+             3,Draymond,Green
+        """))
+        with patch.object(MergeWriter, "upsert", autospec=True, side_effect=MergeWriter.upsert) as upsert:
+            counts = self.builder.csv(Person).diff(delete_missing=True).build(people)
+
+        assert_that(
+            counts[Person],
+            has_properties(
+                inserted=1,
+                updated=1,
+                deleted=1,
+                unchanged=0,
+            ),
+        )
+        # only changed rows are written
+        assert_that(len(upsert.call_args.args[2]), is_(equal_to(2)))
+
+        counts = self.builder.csv(Person).diff().build(csv(dedent("""
+            id,first,last
+             2,Klay,Thompson-Warrior
+             3,Draymond,Green
+        """)))
+        assert_that(counts[Person], has_properties(inserted=0, updated=0, unchanged=2))
+
+        with Example.new_context(self.graph) as context:
+            assert_that(
+                self.person_store.search(),
+                contains(
+                    has_properties(first="Draymond", last="Green"),
+                    has_properties(first="Klay", last="Thompson-Warrior"),
+                ),
+            )
+            assert_that(
+                context.session.execute(
+                    select(row_hashes.c.row_key).order_by(row_hashes.c.row_key),
+                ).scalars().all(),
+                contains("[2]", "[3]"),
+            )
+
+    def test_build_with_diff_compares_stored_values(self):
+        self.builder.csv(Person).diff().build(self.people)
+
+        counts = self.builder.csv(Person).diff().build(csv(dedent("""
+            id,first,last
+            01,Stephen,Curry
+            02,Klay,Thompson-Warrior
+        """)))
+        assert_that(counts[Person], has_properties(inserted=0, updated=1, unchanged=1))
+
+        with Example.new_context(self.graph) as context:
+            assert_that(
+                context.session.execute(
+                    select(row_hashes.c.row_key).order_by(row_hashes.c.row_key),
+                ).scalars().all(),
+                contains("[1]", "[2]"),
+            )
+
+    def test_build_staged(self):
+        self.builder.csv(Person).build(self.people)
+
+        with self.builder.staged(Example) as staged:
+            staged.csv(Person).build(csv(dedent("""
+                id,first,last
+                 3,Draymond,Green
+            """)))
+
+            # readers do not see the staged build
+            with Example.new_context(self.graph):
+                assert_that(self.person_store.count(), is_(equal_to(2)))
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.person_store.search(),
+                contains(
+                    has_properties(first="Draymond", last="Green"),
+                ),
+            )
+
+        assert_that(
+            [path for path in listdir(dirname(self.tmp_file.name)) if path.endswith(".staging")],
+            is_(empty()),
+        )
+
+    def test_build_staged_keeps_mode(self):
+        self.builder.csv(Person).build(self.people)
+        chmod(self.tmp_file.name, 0o644)
+
+        with self.builder.staged(Example) as staged:
+            staged.csv(Person).build(self.people)
+
+        assert_that(stat(self.tmp_file.name).st_mode & 0o777, is_(equal_to(0o644)))
+
+    def test_build_staged_before_open(self):
+        staged = self.builder.staged(Example)
+
+        assert_that(
+            calling(staged.csv).with_args(Person),
+            raises(ValueError),
+        )
+
+    def test_build_with_gzip_csv(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "person.csv.gz")
+            with gzip_open(path, "wt") as fileobj:
+                fileobj.write(self.people.getvalue())
+
+            self.builder.csv(Person, compression="infer").build(path)
+
+        with Example.new_context(self.graph):
+            assert_that(self.person_store.count(), is_(equal_to(2)))
+
+    def test_build_with_zstd_json_lines(self):
+        self.builder.csv(Person).build(self.people)
+
+        dogs = BytesIO(ZstdCompressor().compress(dedent("""
+            {"id": 1, "name": "Rocco", "owner_id": 2, "is_a_good_boy": false}
+            {"id": 2, "name": "Reza", "owner_id": 1}
+        """).encode()))
+        self.builder.jsonl(Dog, compression="zstd").chunked().build(dogs)
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.dog_store.search(),
+                contains(
+                    has_properties(name="Reza", is_a_good_boy=True),
+                    has_properties(name="Rocco", is_a_good_boy=False),
+                ),
+            )
+
+    def test_build_with_parquet(self):
+        self.builder.csv(Person).build(self.people)
+
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "dog.parquet")
+            write_table(
+                Table.from_pydict(dict(
+                    id=[1, 2, 3],
+                    name=["Rocco", "Reza", "Rookie"],
+                    ignored=["a", "b", "c"],
+                )),
+                path,
+            )
+
+            builder = self.builder.parquet(Dog, chunk_size=2).default(owner_id=1)
+            builder.build(path)
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.dog_store.search(),
+                contains(
+                    has_properties(name="Reza", owner_id=1, is_a_good_boy=True),
+                    has_properties(name="Rocco", owner_id=1, is_a_good_boy=True),
+                    has_properties(name="Rookie", owner_id=1, is_a_good_boy=True),
+                ),
+            )
+        assert_that(builder.progress, has_properties(rows_inserted=3, bytes_read=greater_than(0)))
+
+    def test_build_with_parquet_without_columns(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "dog.parquet")
+            write_table(Table.from_pydict(dict(ignored=["a", "b"])), path)
+
+            assert_that(
+                calling(self.builder.parquet(Dog).build).with_args(path),
+                raises(ValueError, "Cannot build dog without any of its columns"),
+            )
+
+    def test_build_resumes_from_checkpoint(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "person.csv")
+            with open(path, "w") as fileobj:
+                fileobj.write("id,first,last\n1,A,A\n2,B,B\n3,C,C\n1,D,D\n5,E,E\n")
+
+            builder = self.builder.csv(Person).chunked(chunk_size=2).batched(commit_every=2).resume()
+            assert_that(
+                calling(builder.build).with_args(path),
+                raises(IntegrityError),
+            )
+
+            with Example.new_context(self.graph) as context:
+                assert_that(self.person_store.count(), is_(equal_to(2)))
+                assert_that(
+                    context.session.execute(select(checkpoints.c.rows)).scalars().all(),
+                    contains(2),
+                )
+
+            with open(path, "w") as fileobj:
+                # NB rows that were loaded are not read again
+                fileobj.write("id,first,last\n-,-,-\n-,-,-\n3,C,C\n4,D,D\n5,E,E\n")
+
+            builder.build(path)
+
+        with Example.new_context(self.graph) as context:
+            assert_that(self.person_store.count(), is_(equal_to(5)))
+            assert_that(
+                context.session.execute(select(checkpoints.c.rows)).scalars().all(),
+                is_(empty()),
+            )
+
+    def test_build_from_scratch(self):
+        self.builder.csv(Person).build(self.people)
+
+        with TemporaryDirectory() as tmp_dir:
+            people, dogs = join(tmp_dir, "person.csv"), join(tmp_dir, "dog.csv")
+            with open(people, "w") as fileobj:
+                fileobj.write("id,first,last\n3,Draymond,Green\n4,Andrew,Wiggins\n")
+            with open(dogs, "w") as fileobj:
+                fileobj.write("id,name,owner_id\n1,Rocco,4\n2,Reza,3\n")
+
+            self.builder.csv(
+                Example,
+                delete_before_load=True,
+            ).bulk().scratch(workers=2).build([
+                # NB dependency order is restored when merging
+                (Dog, dogs),
+                (Person, people),
+            ])
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.dog_store.search(),
+                contains(
+                    has_properties(name="Reza", owner_id=3, is_a_good_boy=True),
+                    has_properties(name="Rocco", owner_id=4, is_a_good_boy=True),
+                ),
+            )
+            assert_that(self.person_store.count(), is_(equal_to(2)))
+
+    def test_build_from_scratch_checks_foreign_keys(self):
+        with TemporaryDirectory() as tmp_dir:
+            dogs = join(tmp_dir, "dog.csv")
+            with open(dogs, "w") as fileobj:
+                fileobj.write("id,name,owner_id\n1,Rocco,4\n")
+
+            assert_that(
+                calling(self.builder.csv(Example).bulk().scratch(workers=2).build).with_args([
+                    (Dog, dogs),
+                ]),
+                raises(ModelIntegrityError),
+            )
+
+        with Example.new_context(self.graph):
+            assert_that(self.dog_store.count(), is_(equal_to(0)))
+
+    def test_build_from_scratch_rejects_unsupported_modes(self):
+        for builder in (
+            self.builder.csv(Example).bulk().scratch(workers=2).quarantine(CSVRejectSink(StringIO())),
+            self.builder.csv(Example).bulk().scratch(workers=2).parallel(workers=2),
+            self.builder.csv(Example).bulk().scratch(workers=2).batched(commit_every=1),
+            self.builder.csv(Example).bulk().scratch(workers=2).batched(commit_interval=1.0),
+        ):
+            assert_that(
+                calling(builder.build).with_args([(Person, self.people)]),
+                raises(ValueError),
+            )
+
+    def test_build_with_quarantine(self):
+        people = csv(dedent("""
+            id,first,last
+             1,Stephen,Curry
+             1,Seth,Curry
+             2,Klay
+             3,Draymond,Green
+        """))
+        rejected = StringIO()
+        sink = CSVRejectSink(rejected)
+
+        self.builder.csv(Person).quarantine(sink).build(people)
+
+        assert_that(sink.summary(), is_(equal_to(dict(person=2))))
+        assert_that(
+            rejected.getvalue().splitlines(),
+            contains(
+                starts_with('person,UNIQUE constraint failed: person.id,"{""id"": "" 1"", ""first"": ""Seth""'),
+                starts_with('person,NOT NULL constraint failed: person.last,"{""id"": "" 2"", ""first"": ""Klay""'),
+            ),
+        )
+
+        with Example.new_context(self.graph):
+            assert_that(
+                self.person_store.search(),
+                contains(
+                    has_properties(first="Draymond"),
+                    has_properties(first="Stephen"),
+                ),
+            )
+
+    def test_build_with_quarantine_reports_conversion_rejects(self):
+        convert = RowConverter.as_values
+
+        def as_values(converter, row):
+            if row[1] == "Klay":
+                raise ValueError("Cannot convert row")
+            return convert(converter, row)
+
+        sink = CSVRejectSink(StringIO())
+        builder = self.builder.csv(Person).quarantine(sink)
+        with patch.object(RowConverter, "as_values", autospec=True, side_effect=as_values):
+            builder.build(self.people)
+
+        assert_that(sink.summary(), is_(equal_to(dict(person=1))))
+        assert_that(
+            builder.progress,
+            has_properties(rows_parsed=2, rows_inserted=1, rows_rejected=1),
+        )
+
+    def test_bulk_build_with_quarantine_rejects_foreign_key_violations(self):
+        dogs = csv(dedent("""
+            id,name,owner_id
+             1,Rocco,2
+             2,Stray,9
+        """))
+        rejected = StringIO()
+        sink = CSVRejectSink(rejected)
+
+        builder = self.builder.csv(Example).bulk().quarantine(sink)
+        builder.build([(Person, self.people), (Dog, dogs)])
+
+        assert_that(sink.summary(), is_(equal_to(dict(dog=1))))
+        assert_that(builder.progress, has_properties(rows_inserted=3, rows_rejected=1))
+        assert_that(
+            rejected.getvalue().splitlines(),
+            contains(
+                starts_with("dog,FOREIGN KEY constraint failed: dog references person,"),
+            ),
+        )
+
+        with Example.new_context(self.graph):
+            assert_that(self.dog_store.search(), contains(has_properties(name="Rocco")))
+
+    def test_bulk_build_with_quarantine_and_children_first(self):
+        sink = CSVRejectSink(StringIO())
+
+        self.builder.csv(Example).bulk().quarantine(sink).build([(Dog, self.dogs), (Person, self.people)])
+
+        assert_that(sink.summary(), is_(equal_to(dict())))
+        with Example.new_context(self.graph):
+            assert_that(self.dog_store.count(), is_(equal_to(3)))
+
+    def test_bulk_build_raises_foreign_key_violations(self):
+        dogs = csv(dedent("""
+            id,name,owner_id
+             1,Stray,9
+        """))
+
+        assert_that(
+            calling(self.builder.csv(Example).bulk().build).with_args([(Person, self.people), (Dog, dogs)]),
+            raises(IntegrityError),
+        )
+
+    def test_build_with_quarantine_to_table(self):
+        sink = TableRejectSink()
+
+        self.builder.csv(Person).quarantine(sink).build(csv(dedent("""
+            id,first,last
+             1,Stephen,Curry
+             1,Seth,Curry
+        """)))
+
+        with Example.new_context(self.graph) as context:
+            assert_that(self.person_store.count(), is_(equal_to(1)))
+            assert_that(
+                context.session.execute(select(rejects.c.table_name, rejects.c.error)).all(),
+                contains(
+                    ("person", "UNIQUE constraint failed: person.id"),
+                ),
+            )
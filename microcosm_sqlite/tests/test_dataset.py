@@ -1,4 +1,10 @@
-from tempfile import NamedTemporaryFile
+from contextlib import closing
+from gzip import open as gzip_open
+from os import chmod, listdir, stat
+from os.path import join
+from shutil import copyfileobj
+from sqlite3 import connect
+from tempfile import NamedTemporaryFile, TemporaryDirectory
 from typing import Any
 from unittest.mock import patch
 
@@ -118,3 +124,63 @@ class TestDisposeSQLiteConnections:
         assert_that(hasattr(Base2, "local"), is_(False))
         assert_that(Base.session, is_(None))
         assert_that(Base2.session, is_(None))
+
+
+class TestSnapshot:
+
+    def setup_method(self):
+        self.tmp_file = NamedTemporaryFile()
+        self.tmp_dir = TemporaryDirectory()
+        loader = load_from_dict(
+            sqlite=dict(
+                paths=dict(
+                    example=self.tmp_file.name,
+                ),
+            ),
+        )
+        self.graph = create_object_graph(
+            "example",
+            testing=True,
+            loader=loader,
+        )
+        self.foo_store = FooStore()
+
+        Foo.recreate_all(self.graph)
+        with Foo.new_context(self.graph) as context:
+            self.foo_store.create(Foo(id=1))
+            self.foo_store.create(Foo(id=2))
+            context.commit()
+
+    def teardown_method(self):
+        Foo.dispose(self.graph)
+        self.tmp_file.close()
+        self.tmp_dir.cleanup()
+
+    def read_ids(self, path):
+        with closing(connect(path)) as connection:
+            return [id for id, in connection.execute("SELECT id FROM foo ORDER BY id")]
+
+    def test_snapshot(self):
+        destination = join(self.tmp_dir.name, "example.db")
+
+        assert_that(Foo.snapshot(self.graph, destination, pages=1), is_(equal_to(destination)))
+        assert_that(self.read_ids(destination), contains(1, 2))
+        assert_that(listdir(self.tmp_dir.name), contains("example.db"))
+
+    def test_snapshot_keeps_mode(self):
+        destination = join(self.tmp_dir.name, "example.db")
+        Foo.snapshot(self.graph, destination)
+        chmod(destination, 0o644)
+
+        Foo.snapshot(self.graph, destination)
+        assert_that(stat(destination).st_mode & 0o777, is_(equal_to(0o644)))
+
+    def test_snapshot_with_vacuum_and_compression(self):
+        destination = join(self.tmp_dir.name, "example.db.gz")
+        Foo.snapshot(self.graph, destination, vacuum=True, compression="gzip")
+
+        uncompressed = join(self.tmp_dir.name, "example.db")
+        with gzip_open(destination) as source, open(uncompressed, "wb") as target:
+            copyfileobj(source, target)
+
+        assert_that(self.read_ids(uncompressed), contains(1, 2))
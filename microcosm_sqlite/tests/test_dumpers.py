@@ -2,14 +2,65 @@
 Test database building.
 
 """
-from io import StringIO
-from tempfile import NamedTemporaryFile
+from gzip import decompress
+from io import BytesIO, StringIO
+from os.path import join
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from typing import Any
 
-from hamcrest import assert_that, equal_to
+from hamcrest import (
+    assert_that,
+    contains,
+    ends_with,
+    equal_to,
+    has_properties,
+)
 from microcosm.api import create_object_graph
 from microcosm.loaders import load_from_dict
+from pyarrow.parquet import read_table
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Integer,
+    String,
+)
 
-from microcosm_sqlite.tests.fixtures import Example, Person, PersonStore
+from microcosm_sqlite import DataSet
+from microcosm_sqlite.dumpers.parallel import primary_key_ranges
+from microcosm_sqlite.tests.fixtures import (
+    Dog,
+    DogStore,
+    Example,
+    Person,
+    PersonStore,
+)
+
+
+Zoo: Any = DataSet.create("zoo")
+
+
+class Animal(Zoo):
+    __tablename__ = "animal"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+
+    __mapper_args__ = dict(polymorphic_on=kind, polymorphic_identity="animal")
+
+
+class Cat(Animal):
+    __tablename__ = "cat"
+
+    id = Column(Integer, ForeignKey("animal.id"), primary_key=True)
+    lives = Column(Integer, nullable=False)
+
+    __mapper_args__ = dict(polymorphic_identity="cat")
+
+
+def read(path):
+    with open(path, newline="") as fileobj:
+        return fileobj.read()
 
 
 class TestCSVDumpers:
@@ -62,6 +113,165 @@ class TestCSVDumpers:
             equal_to("id,first,last\r\n1,Stephen,Curry\r\n2,Klay,Thompson\r\n")
         )
 
+    def test_dump_streams_in_batches(self):
+        dumper = self.dumper.csv(self.person_store).batched(batch_size=1)
+        session = self.person_store.session
+
+        items = dumper.stream(session)
+        first = next(items)
+        assert_that(first in session, equal_to(True))
+
+        second = next(items)
+        assert_that(first in session, equal_to(False))
+        assert_that(second, has_properties(first="Klay"))
+
+    def test_dump_with_streaming_csv_dump(self):
+        self.dumper.csv(self.person_store, batch_size=1).dump(
+            self.outfile,
+            field_names=["id", "first", "last"],
+        )
+        assert_that(
+            self.outfile.getvalue(),
+            equal_to("id,first,last\r\n1,Stephen,Curry\r\n2,Klay,Thompson\r\n")
+        )
+
+    def test_dump_with_tuples(self):
+        self.dumper.csv(self.person_store).tuples().dump(
+            self.outfile,
+            field_names=["id", "first", "last"],
+            custom_header=dict(
+                id="ID",
+                last="Last Name",
+            ),
+        )
+        assert_that(
+            self.outfile.getvalue(),
+            equal_to("ID,,Last Name\r\n1,Stephen,Curry\r\n2,Klay,Thompson\r\n")
+        )
+
+    def test_dump_with_tuples_in_column_order(self):
+        self.dumper.csv(self.person_store).tuples().dump(self.outfile)
+        assert_that(
+            self.outfile.getvalue(),
+            equal_to("id,first,last\r\n1,Stephen,Curry\r\n2,Klay,Thompson\r\n")
+        )
+
+    def test_dump_with_tuples_converts_types(self):
+        dog_store = DogStore()
+        with Example.new_context(self.graph):
+            dog_store.create(Dog(id=1, name="Rocco", owner_id="1", is_a_good_boy=True))
+            dog_store.session.commit()
+
+        field_names = ["id", "name", "is_a_good_boy", "owner_id"]
+        self.dumper.csv(dog_store).dump(self.outfile, field_names=field_names)
+        tuples = StringIO()
+        self.dumper.csv(dog_store).tuples().dump(tuples, field_names=field_names)
+
+        assert_that(tuples.getvalue(), equal_to(self.outfile.getvalue()))
+        assert_that(tuples.getvalue(), ends_with("1,Rocco,True,1\r\n"))
+
+    def test_dump_with_gzip_json_lines(self):
+        outfile = BytesIO()
+        self.dumper.jsonl(self.person_store, compression="gzip").dump(
+            outfile,
+            field_names=["id", "first", "last"],
+        )
+        assert_that(
+            decompress(outfile.getvalue()).decode(),
+            equal_to(
+                '{"id": 1, "first": "Stephen", "last": "Curry"}\n'
+                '{"id": 2, "first": "Klay", "last": "Thompson"}\n'
+            ),
+        )
+
+    def test_dump_with_parquet(self):
+        outfile = BytesIO()
+        self.dumper.parquet(self.person_store, batch_size=1).dump(
+            outfile,
+            field_names=["id", "first", "last"],
+        )
+        assert_that(
+            read_table(BytesIO(outfile.getvalue())).to_pylist(),
+            contains(
+                dict(id=1, first="Stephen", last="Curry"),
+                dict(id=2, first="Klay", last="Thompson"),
+            ),
+        )
+
+    def test_dump_changes(self):
+        dumper = self.dumper.csv(self.person_store).track_changes()
+        field_names = ["id", "first", "last"]
+
+        with Example.new_context(self.graph):
+            self.person_store.create(Person(id=3, first="Draymond", last="Green"))
+            self.person_store.session.commit()
+
+        watermark = dumper.dump_changes(self.outfile, field_names=field_names)
+        assert_that(
+            self.outfile.getvalue(),
+            equal_to("id,first,last,_operation\r\n3,Draymond,Green,insert\r\n"),
+        )
+
+        with Example.new_context(self.graph):
+            self.person_store.delete(first="Draymond")
+            person = self.person_store.one(first="Stephen")
+            person.last = "Curry II"
+            self.person_store.session.commit()
+
+        outfile = StringIO()
+        next_watermark = dumper.dump_changes(outfile, since=watermark, field_names=field_names)
+        assert_that(
+            outfile.getvalue(),
+            equal_to(
+                "id,first,last,_operation\r\n"
+                "3,,,delete\r\n"
+                "1,Stephen,Curry II,update\r\n"
+            ),
+        )
+
+        outfile = StringIO()
+        assert_that(dumper.dump_changes(outfile, since=next_watermark), equal_to(next_watermark))
+
+    def test_dump_data_set_in_parallel(self):
+        with TemporaryDirectory() as directory:
+            paths = self.dumper.data_set(Example, workers=2).dump(directory)
+
+            assert_that(
+                paths,
+                equal_to(dict(
+                    dog=[join(directory, "dog.csv")],
+                    person=[join(directory, "person.csv")],
+                )),
+            )
+            assert_that(read(paths["dog"][0]), equal_to("id,name,is_a_good_boy,owner_id\r\n"))
+            assert_that(
+                read(paths["person"][0]),
+                equal_to("id,first,last\r\n1,Stephen,Curry\r\n2,Klay,Thompson\r\n"),
+            )
+
+    def test_dump_sharded_table(self):
+        with TemporaryDirectory() as directory:
+            paths = self.dumper.data_set(Example).shard(Person, 2).dump(
+                directory,
+                model_classes=[Person],
+            )
+
+            assert_that(
+                [read(path) for path in paths["person"]],
+                contains(
+                    "id,first,last\r\n1,Stephen,Curry\r\n",
+                    "id,first,last\r\n2,Klay,Thompson\r\n",
+                ),
+            )
+
+    def test_primary_key_ranges(self):
+        with Example.new_context(self.graph) as context:
+            connection = context.session.connection()
+
+            assert_that(primary_key_ranges(connection, Person, 2), contains((None, 2), (2, None)))
+            assert_that(primary_key_ranges(connection, Person, 3), contains((None, 2), (2, None)))
+            assert_that(primary_key_ranges(connection, Dog, 2), contains((None, None)))
+
     def test_dump_with_csv_dump_custom_header(self):
         self.dumper.csv(self.person_store).dump(
             self.outfile,
@@ -87,3 +297,49 @@ class TestCSVDumpers:
             self.outfile.getvalue(),
             equal_to("id,first,last\r\n2,Klay,Thompson\r\n")
         )
+
+
+class TestJoinedTableDumpers:
+
+    def setup_method(self):
+        self.tmp_file = NamedTemporaryFile()
+        loader = load_from_dict(
+            sqlite=dict(
+                paths=dict(
+                    zoo=self.tmp_file.name,
+                ),
+            ),
+        )
+        self.graph = create_object_graph("example", testing=True, loader=loader)
+        self.dumper = self.graph.sqlite_dumper
+
+        Zoo.create_all(self.graph)
+        with Zoo.new_context(self.graph) as context:
+            context.session.add_all([
+                Animal(id=1, name="Rex"),
+                Cat(id=2, name="Tom", lives=9),
+                Cat(id=3, name="Felix", lives=7),
+            ])
+            context.commit()
+
+    def teardown(self):
+        self.tmp_file.close()
+
+    def test_dump_subclass_with_tuples(self):
+        outfile = StringIO()
+        self.dumper.csv(None, model_cls=Cat).tuples().dump(outfile)
+
+        assert_that(
+            outfile.getvalue(),
+            equal_to("id,kind,name,lives\r\n2,cat,Tom,9\r\n3,cat,Felix,7\r\n"),
+        )
+
+    def test_dump_data_set_in_parallel_by_table(self):
+        with TemporaryDirectory() as directory:
+            paths = self.dumper.data_set(Zoo, workers=2).dump(directory)
+
+            assert_that(
+                read(paths["animal"][0]),
+                equal_to("id,kind,name\r\n1,animal,Rex\r\n2,cat,Tom\r\n3,cat,Felix\r\n"),
+            )
+            assert_that(read(paths["cat"][0]), equal_to("id,lives\r\n2,9\r\n3,7\r\n"))
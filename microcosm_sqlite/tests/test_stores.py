@@ -6,21 +6,62 @@ from hamcrest import (
     assert_that,
     calling,
     contains,
+    contains_inanyorder,
     empty,
     equal_to,
+    has_entries,
+    has_length,
+    has_properties,
+    instance_of,
     is_,
     none,
     raises,
 )
 from microcosm.api import create_object_graph
+from sqlalchemy import create_engine, text, update
+from sqlalchemy.orm import Session
 
+from microcosm_sqlite.caching import ResultCache
 from microcosm_sqlite.errors import (
     DuplicateModelError,
+    InvalidCursorError,
     ModelIntegrityError,
     ModelNotFoundError,
     MultipleModelsFoundError,
 )
-from microcosm_sqlite.tests.fixtures import Person, PersonStore
+from microcosm_sqlite.tests.fixtures import (
+    Dog,
+    DogStore,
+    Person,
+    PersonExclusionStore,
+    PersonStore,
+)
+
+
+class CachedPersonStore(PersonStore):
+    result_cache = ResultCache(max_size=2)
+
+
+class CachedUnversionedPersonStore(PersonStore):
+    result_cache = ResultCache(check_data_version=False)
+
+
+class CachedPersonIdsStore(PersonStore):
+    result_cache = ResultCache()
+
+    def _filter(self, query, ids=None, **kwargs):
+        if ids is not None:
+            query = query.filter(Person.id.in_(ids))
+
+        return super()._filter(query, **kwargs)
+
+
+class CachedDogStore(DogStore):
+    result_cache = ResultCache()
+
+
+class PersonStatementStore(PersonStore):
+    cache_statements = True
 
 
 class TestStore:
@@ -161,3 +202,313 @@ class TestStore:
             self.store.search(offset=1, limit=1),
             contains(self.gw)
         )
+
+    def test_search_after_cursor(self):
+        self.populate()
+
+        first_page = self.store.search(limit=2)
+        assert_that(first_page, contains(self.gc, self.gw))
+
+        cursor = self.store.cursor_for(first_page[-1])
+        assert_that(self.store.search(after=cursor, limit=2), contains(self.rf))
+        assert_that(self.store.first(after=cursor), is_(equal_to(self.rf)))
+        assert_that(self.store.search(after=self.store.cursor_for(self.rf)), is_(empty()))
+        assert_that(
+            self.store.search(first="George", after=self.store.cursor_for(self.gc)),
+            contains(self.gw),
+        )
+
+    def test_search_after_invalid_cursor(self):
+        assert_that(
+            calling(self.store.search).with_args(after="not-a-cursor"),
+            raises(InvalidCursorError),
+        )
+
+    def test_iter_search(self):
+        self.populate()
+        session = self.context.session
+        session.expunge_all()
+
+        results = self.store.iter_search(batch_size=2)
+        gc, gw = next(results), next(results)
+        assert_that([gc in session, gw in session], contains(True, True))
+
+        rf = next(results)
+        assert_that([gc in session, gw in session, rf in session], contains(False, False, True))
+        assert_that([gc, gw, rf], contains(self.gc, self.gw, self.rf))
+
+        assert_that(list(results), is_(empty()))
+        assert_that(rf in session, is_(False))
+
+    def test_iter_search_keeps_held_instances(self):
+        self.populate()
+        session = self.context.session
+        session.expunge_all()
+        gw = self.store.one(last="Washington")
+
+        assert_that(list(self.store.iter_search(batch_size=1)), contains(self.gc, gw, self.rf))
+        assert_that(gw in session, is_(True))
+
+    def test_iter_search_rejects_pagination(self):
+        assert_that(
+            calling(self.store.iter_search).with_args(limit=10),
+            raises(ValueError),
+        )
+
+    def test_iter_search_with_filter(self):
+        self.populate()
+
+        assert_that(
+            list(self.store.iter_search(batch_size=1, first="George")),
+            contains(self.gc, self.gw),
+        )
+
+    def test_get_many(self):
+        self.populate()
+
+        assert_that(
+            self.store.get_many([3, 1, 4, 1], batch_size=1),
+            is_(equal_to({1: self.gc, 3: self.rf})),
+        )
+        assert_that(self.store.get_many([1, 2], first="Rosalind"), is_(empty()))
+
+    def test_search_by(self):
+        self.populate()
+
+        assert_that(
+            self.store.search_by("first", ["George", "Rosalind", "Karl"]),
+            has_entries(
+                George=contains_inanyorder(self.gc, self.gw),
+                Rosalind=contains(self.rf),
+            ),
+        )
+
+    def test_create_many(self):
+        created = self.store.create_many(
+            [self.gw, dict(id=3, first="Rosalind", last="Franklin"), self.gc],
+            batch_size=2,
+        )
+
+        assert_that(created, is_(equal_to(3)))
+        assert_that(self.store.search(), contains(self.gc, self.gw, self.rf))
+
+    def test_create_many_duplicate_error(self):
+        self.populate()
+
+        assert_that(
+            calling(self.store.create_many).with_args([Person(id=1, first="First", last="Last")]),
+            raises(DuplicateModelError),
+        )
+
+    def test_create_many_with_failures(self):
+        self.populate()
+        failures = []
+
+        created = self.store.create_many(
+            [
+                dict(id=4, first="Karl", last="Marx"),
+                dict(id=1, first="First", last="Last"),
+                dict(id=5, first=None, last="Curie"),
+            ],
+            failures=failures,
+        )
+
+        assert_that(created, is_(equal_to(1)))
+        assert_that(
+            failures,
+            contains(
+                contains(has_entries(id=1), instance_of(DuplicateModelError)),
+                contains(has_entries(id=5), instance_of(ModelIntegrityError)),
+            ),
+        )
+        assert_that(self.store.count(), is_(equal_to(4)))
+
+    def test_update_many(self):
+        self.populate()
+
+        updated = self.store.update_many([dict(id=1, last="Harrison"), dict(id=3, first="Ada")])
+        assert_that(updated, is_(equal_to(2)))
+        assert_that(self.store.update_many(values=dict(last="Lovelace"), first="Ada"), is_(equal_to(1)))
+
+        self.context.session.expire_all()
+        assert_that(
+            self.store.search(),
+            contains(
+                has_properties(first="Ada", last="Lovelace"),
+                has_properties(first="George", last="Harrison"),
+                has_properties(first="George", last="Washington"),
+            ),
+        )
+
+    def test_update_many_without_values(self):
+        self.populate()
+
+        assert_that(
+            calling(self.store.update_many).with_args([dict(id=1)]),
+            raises(ValueError),
+        )
+
+    def test_search_by_with_except_filter(self):
+        store = PersonExclusionStore()
+        self.populate()
+
+        assert_that(
+            store.search_by("first", ["George", "Rosalind"], exclude_first="Rosalind"),
+            is_(equal_to(dict(George=[self.gc, self.gw]))),
+        )
+        assert_that(
+            store.get_many([1, 3], exclude_first="George"),
+            is_(equal_to({3: self.rf})),
+        )
+
+    def test_update_many_not_found(self):
+        self.populate()
+
+        assert_that(
+            calling(self.store.update_many).with_args([dict(id=99, last="Nobody")]),
+            raises(ModelNotFoundError),
+        )
+
+        failures = []
+        updated = self.store.update_many(
+            [dict(id=1, last="Harrison"), dict(id=99, last="Nobody")],
+            failures=failures,
+        )
+        assert_that(updated, is_(equal_to(1)))
+        assert_that(
+            failures,
+            contains(contains(has_entries(id=99), instance_of(ModelNotFoundError))),
+        )
+
+    def test_search_with_result_cache(self):
+        store = CachedPersonStore()
+        self.populate()
+
+        assert_that(store.search(first="George"), contains(self.gc, self.gw))
+        assert_that(store.search(first="George"), contains(self.gc, self.gw))
+        assert_that(store.one(first="Rosalind"), is_(equal_to(self.rf)))
+        assert_that(store.result_cache, has_properties(hits=1, misses=2))
+
+        # writes invalidate cached results
+        store.delete(first="Rosalind")
+        assert_that(
+            calling(store.one).with_args(first="Rosalind"),
+            raises(ModelNotFoundError),
+        )
+        store.create(Person(id=4, first="George", last="Harrison"))
+        assert_that(store.search(first="George"), has_length(3))
+
+    def test_search_with_result_cache_and_unhashable_arguments(self):
+        store = CachedPersonIdsStore()
+        self.populate()
+
+        assert_that(store.search(ids=[1, 3]), contains(self.gc, self.rf))
+        assert_that(store.result_cache, has_properties(hits=0, misses=0))
+
+    def test_search_with_result_cache_across_sessions(self):
+        store = CachedDogStore()
+        self.populate()
+        store.create(Dog(id=1, name="Rocco", owner_id=self.gw.id))
+        self.context.commit()
+        self.context.close()
+
+        with Person.new_context(self.graph):
+            assert_that(store.search(), contains(has_properties(name="Rocco")))
+
+        with Person.new_context(self.graph) as context:
+            dog, = store.search()
+            assert_that(dog in context.session, is_(True))
+            assert_that(dog.owner, has_properties(first="George", last="Washington"))
+
+        assert_that(store.result_cache, has_properties(hits=1, misses=1))
+
+    def test_session_without_data_set_bind_commits(self):
+        engine = create_engine("sqlite://")
+        Person.metadata.create_all(engine)
+
+        session = Session(binds={Person: engine})
+        session.add(Person(id=1, first="Karl", last="Marx"))
+        session.commit()
+
+        assert_that(session.query(Person).count(), is_(equal_to(1)))
+        session.close()
+
+    def test_result_cache_skips_uncommitted_writes(self):
+        store = CachedUnversionedPersonStore()
+        self.populate()
+
+        store.create(Person(id=5, first="George", last="Harrison"))
+        assert_that(store.search(first="George"), has_length(3))
+        assert_that(store.result_cache, has_properties(hits=0, misses=0))
+
+        self.context.rollback()
+        assert_that(store.search(first="George"), has_length(2))
+        assert_that(store.search(first="George"), has_length(2))
+        assert_that(store.result_cache, has_properties(hits=1, misses=1))
+
+    def test_result_cache_hits_across_read_only_transactions(self):
+        store = CachedPersonStore()
+        store.result_cache = ResultCache()
+        self.populate()
+
+        for _ in range(3):
+            assert_that(store.one(first="Rosalind"), is_(equal_to(self.rf)))
+            self.context.commit()
+
+        assert_that(store.result_cache, has_properties(hits=2, misses=1))
+
+    def test_result_cache_sees_statements_of_its_session(self):
+        self.assert_cache_sees_statements(CachedPersonStore())
+
+    def test_unversioned_result_cache_sees_statements_of_its_session(self):
+        self.assert_cache_sees_statements(CachedUnversionedPersonStore())
+
+    def assert_cache_sees_statements(self, store):
+        self.populate()
+        assert_that(store.one(first="Rosalind"), has_properties(last="Franklin"))
+
+        self.context.session.execute(update(Person).where(Person.id == 3).values(last="Elion"))
+        assert_that(store.one(first="Rosalind"), has_properties(last="Elion"))
+        self.context.commit()
+        assert_that(store.one(first="Rosalind"), has_properties(last="Elion"))
+
+        self.context.session.execute(text("UPDATE person SET last = 'Franklin' WHERE id = 3"))
+        # NB unlike ORM-enabled updates, textual ones do not synchronize the session
+        self.context.session.expunge_all()
+        assert_that(store.one(first="Rosalind"), has_properties(last="Franklin"))
+        self.context.commit()
+        assert_that(store.one(first="Rosalind"), has_properties(last="Franklin"))
+
+    def test_result_cache_keys_by_engine(self):
+        result_cache = ResultCache(check_data_version=False)
+        sessions = [
+            Session(bind=create_engine("sqlite://"))
+            for _ in range(2)
+        ]
+
+        assert_that(result_cache.get_or_load(sessions[0], "key", lambda: 0), is_(equal_to(0)))
+        assert_that(result_cache.get_or_load(sessions[1], "key", lambda: 1), is_(equal_to(1)))
+        assert_that(result_cache.get_or_load(sessions[0], "key", lambda: 2), is_(equal_to(0)))
+
+        for session in sessions:
+            session.close()
+
+    def test_search_with_cached_statements(self):
+        store = PersonStatementStore()
+        self.populate()
+
+        assert_that(store.search(first="George", limit=1), contains(self.gc))
+        assert_that(store.search(first="George", offset=1, limit=1), contains(self.gw))
+        assert_that(store.search(first="Rosalind", offset=0, limit=5), contains(self.rf))
+        assert_that(store.search(first="George", last="Washington"), contains(self.gw))
+        assert_that(store.first(first="George", limit=5), is_(equal_to(self.gc)))
+        assert_that(store.one(first="Rosalind"), is_(equal_to(self.rf)))
+        assert_that(store.count(first="George"), is_(equal_to(2)))
+        assert_that(store.count(), is_(equal_to(3)))
+        assert_that(
+            calling(store.one).with_args(first="George"),
+            raises(MultipleModelsFoundError),
+        )
+
+        # one query per shape, without other filter arguments
+        assert_that(store.queries, has_length(6))
@@ -26,11 +26,19 @@ setup(
         "microcosm>=4.0.0",
     ],
     extras_require={
+        "parquet": [
+            "pyarrow>=10.0.0",
+        ],
+        "zstd": [
+            "zstandard>=0.19.0",
+        ],
         "test": [
             "coverage>=3.7.1",
             "PyHamcrest>=1.8.5",
+            "pyarrow>=10.0.0",
             "pytest-cov>=5.0.0",
             "pytest>=6.2.5",
+            "zstandard>=0.19.0",
         ],
         "lint": [
             "flake8",